@@ -1,6 +1,7 @@
 import sys
 import time
 import numpy as np
+from PIL import Image
 from abc import ABC, abstractmethod
 
 IS_LINUX_OS = sys.platform.startswith('linux')
@@ -84,6 +85,8 @@ else:
     neopixel_write = None # Not used in mock
 
 class BaseSwitch(ABC):
+    __slots__ = ()
+
     @property
     @abstractmethod
     def value(self) -> bool:
@@ -95,6 +98,8 @@ class BaseSwitch(ABC):
         pass
 
 class BasePad(ABC):
+    __slots__ = ()
+
     @property
     @abstractmethod
     def value(self) -> int:
@@ -115,11 +120,17 @@ class BasePad(ABC):
     def armed(self) -> bool:
         pass
 
+    @abstractmethod
+    def update(self, now: float) -> int:
+        pass
+
     @abstractmethod
     def zero(self):
         pass
 
 class BasePixelbuf(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def __init__(self, pin, size, **kwargs):
         pass
@@ -132,45 +143,68 @@ class BasePixelbuf(ABC):
     def fill(self, color):
         pass
 
+    @abstractmethod
+    def set_rgb(self, colors: np.ndarray):
+        """Write an (n, 3) uint8 RGB array to the first n pixels"""
+        pass
+
     @abstractmethod
     def show(self):
         pass
 
-class KalmanFilter:
-    def __init__(self, F, H, Q, R, x0, P0):
-        self._F = F
-        self._H = H
-        self._Q = Q
-        self._R = R
-        self.x = x0
-        self._P = P0
+def steady_state_gain(F, H, Q, R, tol=1e-12, max_iter=10000):
+    """Iterate the Riccati recursion until the gain of a 1D measurement filter converges"""
+    P = np.eye(F.shape[0])
+    K = np.zeros((F.shape[0], 1))
+    for _ in range(max_iter):
+        Pk = F @ P @ F.T + Q
+        K_next = Pk @ H.T / (H @ Pk @ H.T + R)[0, 0]
+        P = Pk - K_next @ (H @ Pk)
+        if np.abs(K_next - K).max() < tol:
+            return K_next
+        K = K_next
+    return K
+
+def _const(a):
+    a = np.array(a, dtype=float)
+    a.flags.writeable = False
+    return a
+
+# The default pad filter is time-invariant, so its gain is solved once at import
+_T_CONST = 0.01
+_F_CONST = _const([[1, _T_CONST], [0, 1]])
+_H_CONST = _const([[1, 0]])
+_Q_CONST = _const([[_T_CONST**3/3, _T_CONST**2/2], [_T_CONST**2/2, _T_CONST]])
+_R_CONST = _const([[1]])
+
+# Closed-loop matrix and gain of the converged default filter
+_K_SS_CONST = steady_state_gain(_F_CONST, _H_CONST, _Q_CONST, _R_CONST)
+_A_CL_CONST = _const(_F_CONST - _K_SS_CONST @ _H_CONST @ _F_CONST)
+_K_SS_CONST = _const(_K_SS_CONST[:, 0])
+
+class KalmanBank:
+    """
+        Steady-state Kalman filters for several channels stepped together
+        x holds one state row per channel so a single call updates every pad
+    """
+    def __init__(self, n, A, K):
+        self._At = A.T
+        self._K = K
+        self.x = np.zeros((n, A.shape[0]))
+        self._xk = np.empty_like(self.x)
 
     def step(self, y):
-        xk = self._F @ self.x
-        Pk = self._F @ self._P @ self._F.T + self._Q
-
-        K = Pk @ self._H.T @ np.linalg.inv(self._H @ Pk @ self._H.T + self._R)
-        self.x = xk + K @ (y - self._H @ xk)
-        self._P = Pk - K @ self._H @ Pk
-
-def new_default_KalmanFilter():
-    T = 0.01
-    H = np.array([[1,0]])
-    F = np.array([[1, T], [0, 1]])
-    Q = np.array([[T**3/3, T**2/2], [T**2/2, T]])
-    R = np.array([[1]])
-
-    return KalmanFilter(
-        F=F,
-        H=H,
-        Q=Q,
-        R=R,
-        x0=np.array([0, 0]),
-        P0=np.array([[1, 0], [0, 1]])
-    )
+        np.matmul(self.x, self._At, out=self._xk)
+        np.multiply.outer(y, self._K, out=self.x)
+        self.x += self._xk
+
+def new_default_KalmanBank(n: int):
+    return KalmanBank(n, A=_A_CL_CONST, K=_K_SS_CONST)
 
 if IS_LINUX_OS:
     class Switch(BaseSwitch):
+        __slots__ = ('_pin', 'last_val', '_changed')
+
         def __init__(self, pin: digitalio.DigitalInOut):
             self._pin = pin
             self.last_val = not self._pin.value
@@ -191,24 +225,38 @@ if IS_LINUX_OS:
             return self._changed
 
     class Pad(BasePad):
+        __slots__ = ('_adc', '_offset', '_max', '_min', '_trigger_threshold', '_trigger_level', 'last_triggered',
+                     '_rearm_at', '_armed', '_value')
+
         def __init__(self, adc: AnalogIn):
             self._adc = adc
             self._offset = 0
             self._max = 40000
             self._min = 4000
             self._trigger_threshold = 15000
-            self._kalman = new_default_KalmanFilter()
+            # Threshold in raw ADC counts, so the trigger test skips the offset subtraction
+            self._trigger_level = self._trigger_threshold + self._offset
             self.last_triggered = time.monotonic()
+            self._rearm_at = self.last_triggered + .02
             self._armed = True
+            self._value = 0
+
+        def update(self, now: float) -> int:
+            """Sample the ADC and update the trigger state using the caller's timestamp"""
+            raw = self._adc.value
+            if raw < self._trigger_level and self._armed:
+                self.last_triggered = now
+                self._rearm_at = now + .02
+                self._armed = False
+            elif now > self._rearm_at:
+                self._armed = True
+            val = raw - self._offset
+            self._value = val
+            return val
         
         @property
         def value(self) -> int:
-            if self._adc.value - self._offset < self._trigger_threshold and self._armed:
-                self.last_triggered = time.monotonic()
-                self._armed = False
-            if (time.monotonic() - self.last_triggered) > .02:
-                self._armed = True
-            return self._adc.value - self._offset
+            return self._value
         
         @property
         def velocity(self) -> int:
@@ -224,17 +272,276 @@ if IS_LINUX_OS:
 
         def zero(self):
             self._offset = self._adc.value
+            self._trigger_level = self._trigger_threshold + self._offset
+
+    class PadArray:
+        """
+            Structure-of-arrays state for all pads
+            Reads every MCP3008 channel under a single SPI bus lock, then runs
+            the trigger/re-arm logic as vector ops
+        """
+        __slots__ = ('_spi', '_cs', '_baudrate', '_n', '_trigger_threshold', '_tx', '_rx', '_frames',
+                     '_rx_words', 'raw', 'offset', 'values', 'rearm_at', 'armed', '_trigger', '_rearm',
+                     '_kalman', 'smoothed')
+
+        def __init__(self, spi: busio.SPI, cs: digitalio.DigitalInOut, n: int = 8, baudrate: int = 100000):
+            self._spi = spi
+            self._cs = cs
+            self._cs.switch_to_output(value=True)
+            self._baudrate = baudrate
+            self._n = n
+            self._trigger_threshold = 15000
+
+            # One start bit + single-ended channel select + one dummy byte per channel
+            self._tx = bytes(b for ch in range(n) for b in (0x01, (0x08 | ch) << 4, 0x00))
+            self._rx = bytearray(3 * n)
+            tx, rx = memoryview(self._tx), memoryview(self._rx)
+            self._frames = tuple((tx[3*i:3*i + 3], rx[3*i:3*i + 3]) for i in range(n))
+            # Bytes 1-2 of each reply as one big-endian word, viewed in place
+            self._rx_words = np.ndarray((n,), dtype='>u2', buffer=self._rx, offset=1, strides=(3,))
+
+            self.raw = np.zeros(n, np.int32)
+            self.offset = np.zeros(n, np.int32)
+            self.values = np.zeros(n, np.int32)
+            # Re-arm deadlines rather than trigger times, so a poll compares instead of subtracting
+            self.rearm_at = np.full(n, time.monotonic() + .02)
+            self.armed = np.ones(n, bool)
+            self._trigger = np.empty(n, bool)
+            self._rearm = np.empty(n, bool)
+            # Filtered level, not bounded to the ADC range since the constant-velocity model overshoots steps.
+            # Triggering and the Status readout stay on the raw values
+            self._kalman = new_default_KalmanBank(n)
+            self.smoothed = self._kalman.x[:, 0]
+
+        def read_all(self):
+            """Read all channels into raw, scaled to 16 bits like AnalogIn.value"""
+            spi = self._spi
+            cs = self._cs
+            while not spi.try_lock():
+                pass
+            try:
+                spi.configure(baudrate=self._baudrate)
+                # The MCP3008 starts a conversion on each CS falling edge and CS is a GPIO,
+                # so it still toggles per channel but the bus is locked and configured once
+                write_readinto = spi.write_readinto
+                for tx, rx in self._frames:
+                    cs.value = False
+                    write_readinto(tx, rx)
+                    cs.value = True
+            finally:
+                spi.unlock()
+
+            # ((rx[1] & 3) << 8 | rx[2]) << 6
+            np.bitwise_and(self._rx_words, 0x3FF, out=self.raw, casting='unsafe')
+            self.raw <<= 6
+
+        def poll(self, now: float):
+            self.read_all()
+            np.subtract(self.raw, self.offset, out=self.values)
+            self._kalman.step(self.values)
+
+            np.less(self.values, self._trigger_threshold, out=self._trigger)
+            self._trigger &= self.armed
+            np.putmask(self.rearm_at, self._trigger, now + .02)
+            # trigger is a subset of armed, so xor disarms exactly the pads that just fired
+            np.logical_xor(self.armed, self._trigger, out=self.armed)
+            np.less(self.rearm_at, now, out=self._rearm)
+            self.armed |= self._rearm
+
+        def zero(self):
+            self.read_all()
+            self.offset[:] = self.raw
+
+    _SET_COL_ADDR = 0x21
+    _SET_PAGE_ADDR = 0x22
+
+    class _DirtyWindow:
+        """
+            Tracks what the panel RAM holds and finds the page/column box where
+            the framebuffer differs from it
+        """
+        __slots__ = ('_pages', '_sent', 'full')
+
+        def __init__(self, pages: np.ndarray):
+            self._pages = pages
+            self._sent = np.zeros_like(pages)
+            self.full = True
+
+        def take(self) -> tuple[int, int, int, int] | None:
+            """Page and column range (end exclusive) to send next, marked as sent, or None if nothing changed"""
+            if self.full:
+                self._sent[...] = self._pages
+                self.full = False
+                return 0, self._pages.shape[0], 0, self._pages.shape[1]
+
+            changed = self._pages != self._sent
+            rows = np.flatnonzero(changed.any(axis=1))
+            if rows.size == 0:
+                return None
+            cols = np.flatnonzero(changed.any(axis=0))
+            p0, p1 = int(rows[0]), int(rows[-1]) + 1
+            c0, c1 = int(cols[0]), int(cols[-1]) + 1
+            self._sent[p0:p1, c0:c1] = self._pages[p0:p1, c0:c1]
+            return p0, p1, c0, c1
+
+    class BatchedSSD1306_I2C(adafruit_ssd1306.SSD1306_I2C):
+        """
+            SSD1306_I2C that sends the address window and the frame as one I2C write
+            Each command byte is prefixed with a Co=1 control byte, then a single
+            Co=0 data control byte precedes the framebuffer, so show() is one
+            transaction instead of six command writes plus the data write
+            After the first frame only the bounding box of changed page bytes is
+            sent, and an unchanged frame sends nothing at all
+        """
+        def __init__(self, width: int, height: int, i2c, addr: int = 0x3C, reset=None):
+            prefix = bytes([
+                0x80, _SET_COL_ADDR, 0x80, 0, 0x80, width - 1,
+                0x80, _SET_PAGE_ADDR, 0x80, 0, 0x80, height // 8 - 1,
+                0x40,
+            ])
+            # Allocated before super().__init__ since init_display() already calls show()
+            self._frame = bytearray(prefix) + bytearray((height // 8) * width)
+            self._pages = np.frombuffer(self._frame, np.uint8, offset=len(prefix)).reshape(height // 8, width)
+            self._dirty = _DirtyWindow(self._pages)
+            # Scratch for windowed writes
+            self._tx = bytearray(self._frame)
+            self._tx_data = np.frombuffer(self._tx, np.uint8, offset=len(prefix))
+            super().__init__(width, height, i2c, addr=addr, reset=reset)
+            # Draw straight into the transmit buffer so show() never copies the frame
+            self.buf = memoryview(self._frame)[len(prefix):]
+
+        def invalidate(self):
+            """Force the next show() to push the whole frame"""
+            self._dirty.full = True
+
+        def _next_write(self) -> tuple[bytearray, int] | None:
+            """Buffer and end offset of the write that brings the panel up to date, None if it already is"""
+            box = self._dirty.take()
+            if box is None:
+                return None
+            p0, p1, c0, c1 = box
+            if p1 - p0 == self.pages and c1 - c0 == self.width:
+                return self._frame, len(self._frame)
+
+            window = self._pages[p0:p1, c0:c1]
+            n = window.size
+            tx = self._tx
+            tx[3], tx[5], tx[9], tx[11] = c0, c1 - 1, p0, p1 - 1
+            # Horizontal addressing wraps inside the window, so rows go out back to back
+            self._tx_data[:n].reshape(window.shape)[...] = window
+            return tx, 13 + n
+
+        def show(self):
+            pending = self._next_write()
+            if pending is not None:
+                with self.i2c_device:
+                    self.i2c_device.write(pending[0], end=pending[1])
+
+    class BatchedSSD1306_SPI(adafruit_ssd1306.SSD1306_SPI):
+        """
+            SSD1306_SPI that sends the changed window under one CS assertion
+            D/C is dropped for the six address commands and raised for the data,
+            instead of one SPI transaction per command byte
+        """
+        def __init__(self, width: int, height: int, spi: busio.SPI, dc, reset, cs, baudrate: int = 10_000_000):
+            self._dirty = None
+            super().__init__(width, height, spi, dc, reset, cs, baudrate=baudrate)
+            self._pages = np.frombuffer(self.buffer, np.uint8).reshape(height // 8, width)
+            self._dirty = _DirtyWindow(self._pages)
+            self._cmd = bytearray([_SET_COL_ADDR, 0, width - 1, _SET_PAGE_ADDR, 0, height // 8 - 1])
+            self._tx = bytearray(len(self.buffer))
+            self._tx_data = np.frombuffer(self._tx, np.uint8)
+
+        def invalidate(self):
+            """Force the next show() to push the whole frame"""
+            self._dirty.full = True
+
+        def show(self):
+            if self._dirty is None:
+                # init_display() shows before the window tracker exists
+                super().show()
+                return
+            box = self._dirty.take()
+            if box is None:
+                return
+            p0, p1, c0, c1 = box
+            window = self._pages[p0:p1, c0:c1]
+            n = window.size
+            self._cmd[1], self._cmd[2], self._cmd[4], self._cmd[5] = c0, c1 - 1, p0, p1 - 1
+            self._tx_data[:n].reshape(window.shape)[...] = window
+            with self.spi_device as spi:
+                self.dc_pin.value = 0
+                spi.write(self._cmd)
+                self.dc_pin.value = 1
+                spi.write(self._tx, end=n)
+
+    def show_all(*oleds: BatchedSSD1306_I2C | BatchedSSD1306_SPI):
+        """
+            Flush several panels sharing one I2C bus under a single bus lock
+            Each panel's address still needs its own transfer, but the lock is
+            taken once and panels with nothing new are skipped
+            SPI panels each have their own CS, so they just show() in turn
+        """
+        if not isinstance(oleds[0], BatchedSSD1306_I2C):
+            for oled in oleds:
+                oled.show()
+            return
+        pending = [(oled.i2c_device.device_address, write) for oled in oleds
+                   if (write := oled._next_write()) is not None]
+        if not pending:
+            return
+        i2c = oleds[0].i2c_device.i2c
+        while not i2c.try_lock():
+            pass
+        try:
+            for addr, (buf, end) in pending:
+                i2c.writeto(addr, buf, end=end)
+        finally:
+            i2c.unlock()
+
+    def blit_image(oled: adafruit_ssd1306.SSD1306_I2C, image):
+        """
+            Copy a 1-bit frame (PIL image or uint8 array, any nonzero pixel lit) straight into the SSD1306 framebuffer
+            Packs 8 vertical pixels per byte (LSB on top) in one NumPy pass
+            instead of framebuf's per-pixel image() loop
+        """
+        px = np.asarray(image, dtype=bool)
+        pages = px.reshape(oled.height // 8, 8, oled.width).transpose(0, 2, 1)
+        oled.buf[:] = np.packbits(pages, axis=-1, bitorder="little").tobytes()
 
     class Pi5Pixelbuf(PixelBuf, BasePixelbuf):
         def __init__(self, pin, size, **kwargs):
             self._pin = pin
             super().__init__(size=size, **kwargs)
+            # Pixel rows of the transmit buffer, viewed once so a frame is a single NumPy store
+            self._rgb_view: np.ndarray | None = None
+            self._rgb_order: list[int] = [0, 1, 2]
+            # These are PixelBuf internals, a release that renames them only loses the fast path.
+            # set_rgb reads _pre_brightness_buffer per call, so it has to exist too
+            try:
+                self._rgb_order = list(self._byteorder[:3])
+                if self._bpp == 3 and not self._dotstar_mode and hasattr(self, "_pre_brightness_buffer"):
+                    self._rgb_view = np.frombuffer(self._post_brightness_buffer, np.uint8, size * 3, self._offset).reshape(size, 3)
+            except AttributeError:
+                pass
+
+        def set_rgb(self, colors: np.ndarray):
+            # Plain RGB at full brightness maps straight onto the transmit buffer,
+            # anything else goes through PixelBuf's per pixel path
+            if self._rgb_view is None or self._pre_brightness_buffer is not None:
+                self[0:len(colors)] = colors.tolist()
+                return
+            self._rgb_view[:len(colors), self._rgb_order] = colors
+            if self.auto_write:
+                self.show()
 
         def _transmit(self, buf):
             neopixel_write(self._pin, buf)
 else:
     # Mock implementations for non-Linux
     class Switch(BaseSwitch):
+        __slots__ = ('_pin', 'last_val', '_changed')
+
         def __init__(self, digital_in_out):
             self._pin = digital_in_out
             self.last_val = self._pin.value
@@ -259,6 +566,9 @@ else:
             return self._changed
 
     class Pad(BasePad):
+        __slots__ = ('_adc', '_offset', '_max', '_min', '_trigger_threshold', 'last_triggered', '_armed',
+                     '_press_start_time', '_decay_duration', '_max_per_decay', '_value')
+
         def __init__(self, analog_in):
             self._adc = analog_in
             self._offset = 0
@@ -269,17 +579,21 @@ else:
             self._armed = False
             self._press_start_time = 0
             self._decay_duration = 1.0 # Time in seconds for value to decay from max to 0
-            self._decay_duration = 1.0 # Time in seconds for value to decay from max to 0
+            self._max_per_decay = self._max / self._decay_duration
+            self._value = self._max
+
+        def update(self, now: float) -> int:
+            if self._press_start_time > 0:
+                hold_duration = now - self._press_start_time
+                # Linear decay from max at press time to 0 after _decay_duration
+                self._value = max(0, int(self._max - self._max_per_decay * hold_duration))
+            else:
+                self._value = self._max
+            return self._value
 
         @property
         def value(self) -> int:
-            if self._press_start_time > 0:
-                hold_duration = time.monotonic() - self._press_start_time
-                # Calculate decay factor: 1.0 at start, decreases to 0 over _decay_duration
-                decay_factor = 1.0 - min(1.0, hold_duration / self._decay_duration)
-                simulated_value = int(self._max * decay_factor)
-                return simulated_value
-            return self._max
+            return self._value
         
         @value.setter
         def value(self, new_value: int):
@@ -310,26 +624,61 @@ else:
         def zero(self):
             self._offset = self._adc.value
 
+    class PadArray:
+        """
+            Structure-of-arrays state for the keyboard driven mock pads
+        """
+        __slots__ = ('_pads', 'values', 'armed', '_kalman', 'smoothed')
+
+        def __init__(self, pads: list[Pad]):
+            self._pads = pads
+            n = len(pads)
+            self.values = np.zeros(n, np.int32)
+            self.armed = np.zeros(n, bool)
+            self._kalman = new_default_KalmanBank(n)
+            self.smoothed = self._kalman.x[:, 0]
+
+        def poll(self, now: float):
+            for i, pad in enumerate(self._pads):
+                self.values[i] = pad.update(now)
+                self.armed[i] = pad.armed
+            self._kalman.step(self.values)
+
+        def zero(self):
+            for pad in self._pads:
+                pad.zero()
+
+    def blit_image(oled, image):
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        oled.image(image)
+
+    def show_all(*oleds):
+        for oled in oleds:
+            oled.show()
+
     class Pi5Pixelbuf(BasePixelbuf):
+        __slots__ = ('_pixels', '_auto_write', '_byteorder', '_size')
+
         def __init__(self, pin, size, auto_write=False, byteorder="BGR"):
-            self._pixels = [(0,0,0)] * size
+            self._pixels = np.zeros((size, 3), np.uint8)
             self._auto_write = auto_write
             self._byteorder = byteorder
             self._size = size
 
         def __setitem__(self, key, value):
-            if isinstance(key, slice):
-                start, stop, step = key.indices(self._size)
-                for i in range(start, stop, step):
-                    self._pixels[i] = value
-            else:
-                self._pixels[key] = value
+            # Indices and slices both broadcast the color in one NumPy assignment
+            self._pixels[key] = value
             if self._auto_write:
                 self.show()
 
         def fill(self, color):
-            for i in range(self._size):
-                self._pixels[i] = color
+            self._pixels[:] = color
+            if self._auto_write:
+                self.show()
+
+        def set_rgb(self, colors: np.ndarray):
+            self._pixels[:len(colors)] = colors
             if self._auto_write:
                 self.show()
 
@@ -5,6 +5,10 @@ from pynput import keyboard
 from hardware import Pad, Switch
 from hardware import MockDigitalInOut, MockIncrementalEncoder, MockAnalogIn
 
+# Built once so key events are a single dict lookup instead of per-key lambdas
+_PAD_CHARS = 'qwertyui'
+_PAD_CODES = {keyboard.KeyCode.from_char(c): i for i, c in enumerate(_PAD_CHARS)}
+_SWITCH_CODE = keyboard.KeyCode.from_char('s')
 
 class KeyboardInputManager:
     def __init__(self):
@@ -32,28 +36,12 @@ class KeyboardInputManager:
             keyboard.Key.right: lambda: self._change_encoder(self.sub_encoder, 1),
             keyboard.Key.space: lambda: self._set_button_state(self.main_button, False), # Pressed
             keyboard.Key.enter: lambda: self._set_button_state(self.sub_button, False), # Pressed
-            keyboard.KeyCode.from_char('s'): lambda: self._toggle_switch(),
-            keyboard.KeyCode.from_char('q'): lambda: self._set_pad_state(0, True),
-            keyboard.KeyCode.from_char('w'): lambda: self._set_pad_state(1, True),
-            keyboard.KeyCode.from_char('e'): lambda: self._set_pad_state(2, True),
-            keyboard.KeyCode.from_char('r'): lambda: self._set_pad_state(3, True),
-            keyboard.KeyCode.from_char('t'): lambda: self._set_pad_state(4, True),
-            keyboard.KeyCode.from_char('y'): lambda: self._set_pad_state(5, True),
-            keyboard.KeyCode.from_char('u'): lambda: self._set_pad_state(6, True),
-            keyboard.KeyCode.from_char('i'): lambda: self._set_pad_state(7, True),
+            _SWITCH_CODE: lambda: self._toggle_switch(),
         }
 
         self._release_key_map = {
             keyboard.Key.space: lambda: self._set_button_state(self.main_button, True), # Released
             keyboard.Key.enter: lambda: self._set_button_state(self.sub_button, True), # Released
-            keyboard.KeyCode.from_char('q'): lambda: self._set_pad_state(0, False),
-            keyboard.KeyCode.from_char('w'): lambda: self._set_pad_state(1, False),
-            keyboard.KeyCode.from_char('e'): lambda: self._set_pad_state(2, False),
-            keyboard.KeyCode.from_char('r'): lambda: self._set_pad_state(3, False),
-            keyboard.KeyCode.from_char('t'): lambda: self._set_pad_state(4, False),
-            keyboard.KeyCode.from_char('y'): lambda: self._set_pad_state(5, False),
-            keyboard.KeyCode.from_char('u'): lambda: self._set_pad_state(6, False),
-            keyboard.KeyCode.from_char('i'): lambda: self._set_pad_state(7, False),
         }
 
     def _change_encoder(self, encoder: MockIncrementalEncoder, delta: int):
@@ -73,11 +61,19 @@ class KeyboardInputManager:
                 self.pads[pad_idx].value = 40000 # Zero to indicate released
 
     def _on_press(self, key):
+        pad_idx = _PAD_CODES.get(key)
+        if pad_idx is not None:
+            self._set_pad_state(pad_idx, True)
+            return
         action = self._key_map.get(key)
         if action:
             action()
 
     def _on_release(self, key):
+        pad_idx = _PAD_CODES.get(key)
+        if pad_idx is not None:
+            self._set_pad_state(pad_idx, False)
+            return
         action = self._release_key_map.get(key)
         if action:
             action()
@@ -101,7 +97,7 @@ if __name__ == '__main__':
             # For testing, just print states
             print(f"Enc1: {kb_manager.main_encoder.position}, Enc2: {kb_manager.sub_encoder.position}, "
                   f"Btn1: {not kb_manager.main_button.value}, Btn2: {not kb_manager.sub_button.value}, "
-                  f"Switch: {kb_manager.switch.value}, Pads: {[pad.value for pad in kb_manager.pads]}")
+                  f"Switch: {kb_manager.switch.value}, Pads: {[pad.update(time.monotonic()) for pad in kb_manager.pads]}")
             time.sleep(0.1)
     except KeyboardInterrupt:
         print("Stopping keyboard input manager.")
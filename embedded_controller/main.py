@@ -1,32 +1,41 @@
 from dataclasses import dataclass, field
-from PIL import Image, ImageDraw, ImageTk
+from PIL import Image
 import time
 import logging
+import threading
+import queue
+import numpy as np
+import zmq
 import sys # Added import for sys
 from zmq_channel import ZMQChannel, State
 import modules
-from modules import UIState
-from hardware import IS_LINUX_OS, Pad, Pi5Pixelbuf, Switch, MockDigitalInOut, MockIncrementalEncoder
+from modules import UIState, NUM_PADS, PAD_THRESHOLD
+from util import SnapshotRing, new_frame
+from hardware import IS_LINUX_OS, PadArray, Pi5Pixelbuf, Switch, MockDigitalInOut, MockIncrementalEncoder, blit_image, show_all
 if IS_LINUX_OS:
     import board
     import digitalio
     import adafruit_ssd1306
     from adafruit_blinka.microcontroller.bcm283x.rotaryio import IncrementalEncoder
-    import adafruit_mcp3xxx.mcp3008 as MCP
-    from adafruit_mcp3xxx.analog_in import AnalogIn
     import busio
+    from hardware import BatchedSSD1306_I2C, BatchedSSD1306_SPI
 else:
     # Mock imports for non-Linux
+    # Only the preview needs Tk, so the Pi never loads it
     import tkinter as tk
+    from PIL import ImageTk
     class MockSSD1306:
         _instances = []
         _root = None # Static variable for the root Tkinter instance
+        # The Tk preview is the slowest part of the mock loop, so it only redraws at this rate
+        PREVIEW_INTERVAL: float = 1/15
 
         def __init__(self, width, height, i2c, addr, reset):
             self.width = width
             self.height = height
             self._image = Image.new("1", (self.width, self.height))
             self._tk_image = None
+            self._last_show = 0.0
             self._window = None
             self._canvas = None
             MockSSD1306._instances.append(self)
@@ -45,6 +54,9 @@ else:
             self._window.protocol("WM_DELETE_WINDOW", self._on_closing)
             self._canvas = tk.Canvas(self._window, width=self.width*4, height=self.height*4, bg="black")
             self._canvas.pack()
+            # One PhotoImage for the window's lifetime, show() pastes new pixels into it
+            self._tk_image = ImageTk.PhotoImage(Image.new("1", (self.width * 4, self.height * 4)))
+            self._canvas.create_image(0, 0, anchor=tk.NW, image=self._tk_image)
 
         def _on_closing(self):
             logger.info("Closing MockSSD1306 window.")
@@ -72,14 +84,15 @@ else:
             self._image = img
 
         def show(self):
+            now = time.monotonic()
+            if now - self._last_show < self.PREVIEW_INTERVAL:
+                return
+            self._last_show = now
             if self._window and self._canvas:
-                self._tk_image = ImageTk.PhotoImage(self._image.resize((self.width * 4, self.height * 4), Image.NEAREST))
-                self._canvas.create_image(0, 0, anchor=tk.NW, image=self._tk_image)
+                self._tk_image.paste(self._image.resize((self.width * 4, self.height * 4), Image.NEAREST))
                 self._window.update_idletasks()
-                self._window.update()
-                # Also update the root to ensure all events are processed
-                if MockSSD1306._root:
-                    MockSSD1306._root.update_idletasks()
+                # The root's update() services every display window, so only the last one pumps events
+                if MockSSD1306._root and self is MockSSD1306._instances[-1]:
                     MockSSD1306._root.update()
     adafruit_ssd1306 = MockSSD1306
 
@@ -96,16 +109,30 @@ logger = logging.getLogger(__name__)
 WIDTH: int = 128
 HEIGHT: int = 64
 REFRESH: float = 1/30
+PAD_POLL: float = 1/1000
+INPUT_POLL: float = 1/200
+# Set when both panels are strapped for 4-wire SPI instead of I2C
+OLED_SPI: bool = False
+# Tk is not thread safe, so the mock displays are always pushed from the main loop
+BLIT_THREAD: bool = IS_LINUX_OS
 
 if IS_LINUX_OS:
     # Define the Reset Pin
     oled_reset = digitalio.DigitalInOut(board.D4)
 
-    # Use for I2C.
-    i2c = board.I2C()  # uses board.SCL and board.SDA
-    # i2c = board.STEMMA_I2C()  # For using the built-in STEMMA QT connector on a microcontroller
-    oled1 = adafruit_ssd1306.SSD1306_I2C(WIDTH, HEIGHT, i2c, addr=0x3C, reset=oled_reset)
-    oled2 = adafruit_ssd1306.SSD1306_I2C(WIDTH, HEIGHT, i2c, addr=0x3D, reset=oled_reset)
+    spi = busio.SPI(clock=board.SCK, MISO=board.MISO, MOSI=board.MOSI)
+
+    if OLED_SPI:
+        # Shares the bus with the MCP3008, each panel on its own CS with a common D/C
+        oled_dc = digitalio.DigitalInOut(board.D24)
+        oled1 = BatchedSSD1306_SPI(WIDTH, HEIGHT, spi, oled_dc, oled_reset, digitalio.DigitalInOut(board.D25))
+        oled2 = BatchedSSD1306_SPI(WIDTH, HEIGHT, spi, oled_dc, oled_reset, digitalio.DigitalInOut(board.D16))
+    else:
+        # Use for I2C.
+        i2c = board.I2C()  # uses board.SCL and board.SDA
+        # i2c = board.STEMMA_I2C()  # For using the built-in STEMMA QT connector on a microcontroller
+        oled1 = BatchedSSD1306_I2C(WIDTH, HEIGHT, i2c, addr=0x3C, reset=oled_reset)
+        oled2 = BatchedSSD1306_I2C(WIDTH, HEIGHT, i2c, addr=0x3D, reset=oled_reset)
 
     #encoders
     encoder_main = IncrementalEncoder(board.D17, board.D18)
@@ -120,12 +147,10 @@ if IS_LINUX_OS:
     switch.switch_to_input(pull=digitalio.Pull.UP)
 
     # adc
-    spi = busio.SPI(clock=board.SCK, MISO=board.MISO, MOSI=board.MOSI)
     cs = digitalio.DigitalInOut(board.D5)
-    mcp = MCP.MCP3008(spi, cs)
 
     # neopixel strip
-    pixels = Pi5Pixelbuf(board.D12, 8, auto_write=True, byteorder="BGR")
+    pixels = Pi5Pixelbuf(board.D12, 8, auto_write=False, byteorder="BGR")
     pixels.fill(0)
     pixels.show()
 else:
@@ -137,8 +162,7 @@ else:
     encoder_sub = MockIncrementalEncoder(None, None)
     button_sub = MockDigitalInOut(None)
     switch = MockDigitalInOut(None)
-    mcp = None # MCP is not used directly in the mock setup
-    pixels = Pi5Pixelbuf(None, 8, auto_write=True, byteorder="BGR")
+    pixels = Pi5Pixelbuf(None, 8, auto_write=False, byteorder="BGR")
 
 class EmbeddedController:
     """
@@ -156,8 +180,7 @@ class EmbeddedController:
             self._enc2 = encoder_sub
             self._button1 = button_main
             self._button2 = button_sub
-            self._pads = [Pad(AnalogIn(mcp, MCP.P0)), Pad(AnalogIn(mcp, MCP.P1)), Pad(AnalogIn(mcp, MCP.P2)), Pad(AnalogIn(mcp, MCP.P3)),
-                Pad(AnalogIn(mcp, MCP.P4)), Pad(AnalogIn(mcp, MCP.P5)), Pad(AnalogIn(mcp, MCP.P6)), Pad(AnalogIn(mcp, MCP.P7))]
+            self._pads = PadArray(spi, cs, NUM_PADS)
             self._switch = Switch(switch)
         else:
             from keyboard_input import KeyboardInputManager
@@ -166,79 +189,172 @@ class EmbeddedController:
             self._enc2 = self._keyboard_manager.sub_encoder
             self._button1 = self._keyboard_manager.main_button
             self._button2 = self._keyboard_manager.sub_button
-            self._pads = self._keyboard_manager.pads
+            self._pads = PadArray(self._keyboard_manager.pads)
             self._switch = self._keyboard_manager.switch
 
         # Create blank image for drawing.
-        # Make sure to create image with mode '1' for 1-bit color.
-        self._image1 = Image.new("1", (self._oled1.width, self._oled1.height))
-        self._draw1 = ImageDraw.Draw(self._image1)
-
-        self._image2 = Image.new("1", (self._oled2.width, self._oled2.height))
-        self._draw2 = ImageDraw.Draw(self._image2)
+        # Pixels are shared with NumPy arrays, so clearing and packing need no PIL round trip
+        self._image1, self._draw1, self._px1 = new_frame(self._oled1.width, self._oled1.height)
+        self._image2, self._draw2, self._px2 = new_frame(self._oled2.width, self._oled2.height)
 
         self._pixels = pixels
+        # Modules draw into this frame, the strip is only written when it differs from the last push
+        self._leds = np.zeros((8, 3), np.uint8)
+        self._leds_shown = self._leds.copy()
 
         self._last_state = State()
-        self._last_refresh: float = time.monotonic()
+        self._now: float = time.monotonic()
+        self._last_refresh: float = self._now
 
         # Create and connect the state receiver/command sender
-        self._channel = ZMQChannel("tcp://localhost:5555")
+        self._channel = ZMQChannel()
         if not self._channel.connect():
             sys.exit(1)
+        # The main loop sleeps in here until a new state is published or the next deadline
+        self._poller = zmq.Poller()
+        self._poller.register(self._channel.state_socket, zmq.POLLIN)
 
         # current module activated
         self._input_state = UIState()
         self._input_state.switch = self._switch
+
+        # Pads are sampled on their own thread so hits land while render blocks on I2C.
+        # Each snapshot row is [values..., armed...]
+        self._pad_ring = SnapshotRing(64, 2 * NUM_PADS)
+        self._pad_tail = 0
+        self._poll_thread = threading.Thread(target=self._poll_pads, daemon=True)
+        # Finished frames are handed to a transport thread, newest wins if it falls behind
+        # None in place of a frame stops the thread
+        self._frames: queue.Queue[tuple[np.ndarray, np.ndarray] | None] = queue.Queue(maxsize=1)
+        self._blit_thread = threading.Thread(target=self._blit_frames, daemon=True)
+        # Set by a worker thread that died, run() re-raises it on the main thread
+        self._thread_error: Exception | None = None
         self._modules: list[Module] = [
             modules.Status(self._channel, self._input_state),
             modules.Playback(self._channel, self._input_state)
         ]
+        self._n_modules = len(self._modules)
         self._module_idx = 0
 
     def receive_state(self):
         self._modules[self._module_idx].receive_state()
 
     def receive_input(self):
-        self._input_state.enc1_d = self._enc1.position - self._input_state.enc1_pos
-        self._input_state.enc1_pos = self._enc1.position
+        ui = self._input_state
+        pos = self._enc1.position
+        ui.enc1_d = d = pos - ui.enc1_pos
+        ui.enc1_pos = pos
+        # Step one module in the direction of travel, however far the encoder moved
+        self._module_idx = (self._module_idx + (d > 0) - (d < 0)) % self._n_modules
+
+        pos = self._enc2.position
+        ui.enc2_d = pos - ui.enc2_pos
+        ui.enc2_pos = pos
         
-        if self._input_state.enc1_d > 0:
-            self._module_idx = (self._module_idx + 1) % len(self._modules)
-        elif self._input_state.enc1_d < 0:
-            self._module_idx = (self._module_idx - 1) % len(self._modules)
-
-        self._input_state.enc2_d = self._enc2.position - self._input_state.enc2_pos
-        self._input_state.enc2_pos = self._enc2.position
-        
-        self._input_state.button1_pressed = not self._button1.value
-        self._input_state.button2_pressed = not self._button2.value
-        self._input_state.pad_values = [pad.value for pad in self._pads]
-        self._input_state.pad_armed = [pad.armed for pad in self._pads]
+        ui.button1_pressed = not self._button1.value
+        ui.button2_pressed = not self._button2.value
+        self._read_pads(ui)
         self._modules[self._module_idx].on_input_update()
 
+    def _read_pads(self, ui: UIState):
+        """
+            Fold every snapshot since the last tick into the UI state
+            Shows the newest row, except pads that were hit in between keep the row they fired on,
+            so a press shorter than a tick is still seen
+        """
+        rows, self._pad_tail = self._pad_ring.since(self._pad_tail)
+        if not len(rows):
+            # Nothing new, don't let modules act on the same hit twice
+            ui.pad_armed[:] = 0
+            return
+        ui.pads[:] = rows[-1]
+        values, armed = rows[:, :NUM_PADS], rows[:, NUM_PADS:]
+        fired = (values < PAD_THRESHOLD) & (armed != 0)
+        hit = fired.any(axis=0)
+        if hit.any():
+            first = fired.argmax(axis=0)
+            ui.pad_values[hit] = values[first[hit], hit]
+            ui.pad_armed[hit] = 1
+
+    def _poll_pads(self):
+        try:
+            while True:
+                self._pads.poll(time.monotonic())
+                slot = self._pad_ring.reserve()
+                slot[:NUM_PADS] = self._pads.values
+                slot[NUM_PADS:] = self._pads.armed
+                self._pad_ring.commit()
+                time.sleep(PAD_POLL)
+        except Exception as e:
+            logger.exception("Pad poll thread stopped")
+            self._thread_error = e
+
     def render(self):
-        self._draw1.rectangle((0, 0, self._oled1.width, self._oled1.height), fill=0)
-        self._draw2.rectangle((0, 0, self._oled2.width, self._oled2.height), fill=0)
+        self._px1.fill(0)
+        self._px2.fill(0)
         # self._pixels.fill(0)
 
         self._modules[self._module_idx].render_primary(self._draw1)
         self._modules[self._module_idx].render_secondary(self._draw2)
-        self._modules[self._module_idx].render_leds(self._pixels)
+        self._modules[self._module_idx].render_leds(self._leds)
 
-        self._oled1.image(self._image1)
-        self._oled2.image(self._image2)
-        self._oled1.show()
-        self._oled2.show()
-        self._pixels.show()
+        if BLIT_THREAD:
+            self._queue_frame((self._px1.copy(), self._px2.copy()))
+        else:
+            self._blit(self._image1, self._image2)
+
+        if not np.array_equal(self._leds, self._leds_shown):
+            self._pixels.set_rgb(self._leds)
+            self._pixels.show()
+            self._leds_shown[...] = self._leds
+
+    def _blit(self, image1: Image.Image | np.ndarray, image2: Image.Image | np.ndarray):
+        blit_image(self._oled1, image1)
+        blit_image(self._oled2, image2)
+        show_all(self._oled1, self._oled2)
+
+    def _queue_frame(self, frame: tuple[np.ndarray, np.ndarray] | None):
+        try:
+            self._frames.put_nowait(frame)
+        except queue.Full:
+            # Replace the frame the transport thread has not picked up yet
+            try:
+                self._frames.get_nowait()
+            except queue.Empty:
+                pass
+            self._frames.put_nowait(frame)
+
+    def _blit_frames(self):
+        try:
+            while (frame := self._frames.get()) is not None:
+                self._blit(*frame)
+        except Exception as e:
+            logger.exception("Blit thread stopped")
+            self._thread_error = e
+
+    def stop_blit(self):
+        """Drop any queued frame and wait for the transport thread, so nothing is pushed after this returns"""
+        if self._blit_thread.is_alive():
+            self._queue_frame(None)
+            self._blit_thread.join()
 
     def run(self):
+        self._poll_thread.start()
+        if BLIT_THREAD:
+            self._blit_thread.start()
         while True:
+            if self._thread_error is not None:
+                raise RuntimeError("Worker thread stopped") from self._thread_error
+            # Sampled once per iteration and shared by everything polled below
+            self._now = time.monotonic()
             self.receive_input()
-            if time.monotonic() - self._last_refresh > REFRESH:
+            if self._now - self._last_refresh > REFRESH:
                 self._last_state = self.receive_state()
                 self.render()
                 self._last_refresh = time.monotonic()
+            deadline = min(self._last_refresh + REFRESH, self._now + INPUT_POLL)
+            if self._poller.poll(max(0, int((deadline - time.monotonic()) * 1000))):
+                self._channel.drain_state()
             
 if __name__ == "__main__":
     controller = EmbeddedController()
@@ -246,6 +362,8 @@ if __name__ == "__main__":
         controller.run()
     except KeyboardInterrupt:
         logger.info("Exiting and clearing display...")
+        # The transport thread would otherwise push its last frame over the cleared panels
+        controller.stop_blit()
         # Clear the display
         controller._oled1.fill(0)
         controller._oled1.show()
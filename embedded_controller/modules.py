@@ -1,17 +1,22 @@
 from widgets import *
-from PIL import ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFont
 from abc import ABC, abstractmethod
-from zmq_channel import State, ZMQChannel
-from proto_gen import state_pb2
-from hardware import Pi5Pixelbuf, Switch
+from zmq_channel import State, ZMQChannel, state_pb2
+from hardware import Switch
 
 from dataclasses import dataclass, field
 import util
 import time
+import numpy as np
 
 PAD_MIN: int = 4000
 PAD_MAX: int = 40000
 PAD_THRESHOLD: int = 11000
+NUM_PADS: int = 8
+
+LED_OFF = np.array((0, 0, 0), np.uint8)
+LED_STEP = np.array((12, 0, 0), np.uint8)
+LED_CURSOR = np.array((0, 0, 12), np.uint8)
 
 @dataclass
 class UIState:
@@ -21,10 +26,16 @@ class UIState:
     enc2_d: int = 0
     button1_pressed: bool = False
     button2_pressed: bool = False
-    pad_values: list[int] = field(default_factory=list)
-    pad_armed: list[bool] = field(default_factory=list)
+    # Pad snapshot laid out like the pad ring rows, filled in place with one copy every input tick
+    pads: np.ndarray = field(default_factory=lambda: np.zeros(2 * NUM_PADS, np.int32))
+    pad_values: np.ndarray = field(init=False)
+    pad_armed: np.ndarray = field(init=False)
     switch: Switch | None = None
 
+    def __post_init__(self):
+        self.pad_values = self.pads[:NUM_PADS]
+        self.pad_armed = self.pads[NUM_PADS:]
+
 class Module(ABC):
     @abstractmethod
     def render_primary(self, draw: ImageDraw):
@@ -39,7 +50,8 @@ class Module(ABC):
         pass
 
     @abstractmethod
-    def render_leds(self, pixels: Pi5Pixelbuf):
+    def render_leds(self, leds: np.ndarray):
+        """Write RGB rows into the controller's LED frame, which is only pushed to the strip on change"""
         pass
 
 class Status(Module):
@@ -49,13 +61,14 @@ class Status(Module):
         self._ui_state = ui_state
 
         self._ip_text: Text = Text(util.get_ip())
+        self._prev_input: tuple | None = None
         self._tracks_text: Text = Text("0")
         self._enc1_pos_text: Text = Text(str(self._ui_state.enc1_pos))
         self._enc2_pos_text: Text = Text(str(self._ui_state.enc2_pos))
-        self._button1_text: Text = Text(str(self._ui_state.button1_pressed))
-        self._button2_text: Text = Text(str(self._ui_state.button2_pressed))
-        self._pad_values_text1: Text = Text(str(self._ui_state.pad_values[:4]))
-        self._pad_values_text2: Text = Text(str(self._ui_state.pad_values[4:]))
+        self._button1_text: Text = Text("F")
+        self._button2_text: Text = Text("F")
+        self._pad_values_text1: Text = Text("0,0,0,0")
+        self._pad_values_text2: Text = Text("0,0,0,0")
         self._switch_text: Text = Text(str(self._ui_state.switch.value))
         
         self._primary_widget = VLayout([
@@ -78,28 +91,53 @@ class Status(Module):
                 self._switch_text,
             ])
         ], border=True)
+        self._primary_mask: Image.Image | None = None
+        self._secondary_mask: Image.Image | None = None
+
+    @staticmethod
+    def _rasterize(widget: Widget) -> Image.Image:
+        """Render a widget tree into a standalone mask sized to fit its border"""
+        w, h = widget.get_size()
+        mask = Image.new("1", (w + 1, h + 1))
+        widget.render(ImageDraw.Draw(mask), 0, 0)
+        return mask
     
     def render_primary(self, draw: ImageDraw):
-        self._primary_widget.render(draw, 0, 0)
+        # The tree is only walked when a value changed, other frames stamp the last raster
+        if self._primary_mask is None or self._primary_widget.is_dirty():
+            self._primary_mask = self._rasterize(self._primary_widget)
+        draw.bitmap((0, 0), self._primary_mask, fill=255)
     
     def render_secondary(self, draw: ImageDraw):
-        self._secondary_widget.render(draw, 0, 0)
+        if self._secondary_mask is None or self._secondary_widget.is_dirty():
+            self._secondary_mask = self._rasterize(self._secondary_widget)
+        draw.bitmap((0, 0), self._secondary_mask, fill=255)
     
     def receive_state(self):
         state = self._channel.receive_state()
         self._tracks_text.text = str(len(state.trks))
 
     def on_input_update(self):
-        self._ip_text.text = util.get_ip()
-        self._enc1_pos_text.text = str(self._ui_state.enc1_pos)
-        self._enc2_pos_text.text = str(self._ui_state.enc2_pos)
-        self._button1_text.text = str(self._ui_state.button1_pressed)
-        self._button2_text.text = str(self._ui_state.button2_pressed)
-        self._pad_values_text1.text = str(self._ui_state.pad_values[:4])
-        self._pad_values_text2.text = str(self._ui_state.pad_values[4:])
-        self._switch_text.text = str(self._ui_state.switch.value)
+        # get_ip caches the lookup, so this is a dict read on most ticks
+        self._ip_text.set(util.get_ip())
+        ui = self._ui_state
+        # Most ticks nothing moved, so compare one snapshot instead of every field
+        snapshot = (ui.enc1_pos, ui.enc2_pos, ui.button1_pressed, ui.button2_pressed,
+                    ui.pad_values.tobytes(), ui.switch.value)
+        if snapshot == self._prev_input:
+            return
+        self._prev_input = snapshot
+        self._enc1_pos_text.set(ui.enc1_pos)
+        self._enc2_pos_text.set(ui.enc2_pos)
+        self._button1_text.text = "T" if ui.button1_pressed else "F"
+        self._button2_text.text = "T" if ui.button2_pressed else "F"
+        # One conversion for all pads, formatted straight from it without slicing
+        pv = ui.pad_values.tolist()
+        self._pad_values_text1.text = f"{pv[0]},{pv[1]},{pv[2]},{pv[3]}"
+        self._pad_values_text2.text = f"{pv[4]},{pv[5]},{pv[6]},{pv[7]}"
+        self._switch_text.set(ui.switch.value)
     
-    def render_leds(self, pixels: Pi5Pixelbuf):
+    def render_leds(self, leds: np.ndarray):
         pass
 
 class Playback(Module):
@@ -109,7 +147,104 @@ class Playback(Module):
         self._ui_state = ui_state
         self._last_state = State()
         self._font = ImageFont.load_default()
-    
+
+        # Track rows are built in NumPy once per pattern and stamped with a single bitmap call
+        self._progress_x = 15
+        self._progress_width = 128 - self._progress_x
+        self._progress_height = 10
+        self._progress_spacing = 5
+        self._cursor_height = (self._progress_height + self._progress_spacing) * 3
+        self._segment_cache: dict[tuple[int, int], np.ndarray] = {}
+        self._tracks_cache: dict[tuple, tuple[int, Image.Image]] = {}
+        self._label_cache: dict[str, tuple[tuple[int, int, int, int], Image.Image]] = {}
+        self._layout_len = 0
+        self._cursor_xs: list[tuple[int, int]] = []
+        self._line_xs: list[int] = []
+
+    def _update_layout(self, length: int):
+        """Per step cursor and separator positions, recomputed only when the track length changes"""
+        segment_width = self._progress_width / length
+        left = self._progress_x + np.arange(length) * segment_width
+        # Truncated here once instead of by ImageDraw on every frame
+        self._cursor_xs = list(zip(left.astype(int).tolist(), (left + segment_width).astype(int).tolist()))
+        self._line_xs = [128 * i // (length - 1) if length > 1 else 0 for i in range(length)]
+        self._layout_len = length
+
+    def _get_label(self, text: str) -> tuple[tuple[int, int, int, int], Image.Image]:
+        """
+            Bounding box and pre-rasterized mask of a string, rendered once per distinct text
+            Covers the track letters and the step counter, which cycle through a handful of values
+        """
+        label = self._label_cache.get(text)
+        if label is None:
+            if len(self._label_cache) >= 128:
+                self._label_cache.clear()
+            bbox = self._font.getbbox(text)
+            # Some glyphs spill past getbbox, so leave a margin around the raster
+            mask = Image.new("1", (bbox[2] - bbox[0] + 8, bbox[3] - bbox[1] + 8))
+            ImageDraw.Draw(mask).text((4 - bbox[0], 4 - bbox[1]), text, font=self._font, fill=255)
+            label = bbox, mask
+            self._label_cache[text] = label
+        return label
+
+    def _draw_label(self, draw: ImageDraw, xy: tuple[int, int], text: str):
+        bbox, mask = self._get_label(text)
+        draw.bitmap((xy[0] + bbox[0] - 4, xy[1] + bbox[1] - 4), mask, fill=255)
+
+    def _segment_row(self, length: int, steps: int) -> np.ndarray:
+        """
+            One row of a track's active segments, cached per track length and pattern
+            Edges are truncated the same way ImageDraw treats float rectangle coordinates,
+            and later outlines cut into earlier fills as with per step rectangles
+        """
+        key = (length, steps)
+        row = self._segment_cache.get(key)
+        if row is None:
+            if len(self._segment_cache) >= 64:
+                self._segment_cache.clear()
+            # Walk the set bits lowest first
+            active = []
+            while steps:
+                active.append((steps & -steps).bit_length() - 1)
+                steps &= steps - 1
+            segment_width = self._progress_width / length
+            left = self._progress_x + np.array(active, dtype=float) * segment_width
+            left, right = left.astype(int)[:, None], (left + segment_width).astype(int)[:, None]
+            x = np.arange(self._progress_x, self._progress_x + self._progress_width)
+            fill = ((x > left) & (x < right)).any(axis=0)
+            edges = ((x == left) | (x == right)).any(axis=0)
+            row = np.where(fill & ~edges, 255, 0).astype(np.uint8)
+            self._segment_cache[key] = row
+        return row
+
+    def _tracks_mask(self, length: int, tracks: tuple[tuple[str, int], ...], start_y: int, text_height: int) -> tuple[int, Image.Image]:
+        """
+            Labels and segment rows of every track composed into one mask, so a frame stamps the
+            whole track area with a single bitmap call
+            Returns the mask with the frame row its top edge lands on
+        """
+        key = (length, tracks, start_y, text_height)
+        cached = self._tracks_cache.get(key)
+        if cached is None:
+            if len(self._tracks_cache) >= 64:
+                self._tracks_cache.clear()
+            pitch = self._progress_height + self._progress_spacing
+            stamps = []
+            for i, (label, steps) in enumerate(tracks):
+                y_pos = start_y + i * pitch
+                bbox, label_mask = self._get_label(label)
+                label_y = y_pos + (self._progress_height - text_height) // 2
+                stamps.append((5 + bbox[0] - 4, label_y + bbox[1] - 4, np.asarray(label_mask).astype(np.uint8) * 255))
+                stamps.append((self._progress_x, y_pos + 1, np.repeat(self._segment_row(length, steps)[None, :], 9, axis=0)))
+            top = min(y for _, y, _ in stamps)
+            rows = np.zeros((max(y + a.shape[0] for _, y, a in stamps) - top, 128), dtype=np.uint8)
+            for x, y, a in stamps:
+                region = rows[y - top:y - top + a.shape[0], x:x + a.shape[1]]
+                np.maximum(region, a[:, :region.shape[1]], out=region)
+            cached = top, Image.fromarray(rows)
+            self._tracks_cache[key] = cached
+        return cached
+
     def receive_state(self):
         self._last_state = self._channel.receive_state()
 
@@ -127,70 +262,38 @@ class Playback(Module):
             self._channel.send_command(state_pb2.COMMAND_PLAY_SOUND, track_index=0, velocity=pad1_val)
     
     def render_primary(self, draw: ImageDraw):
-        width = 128
-        height = 64
-        len = self._last_state.trks[0].len
+        trks = self._last_state.trks
+        # Nothing to lay out until a state with a pattern arrives
+        if not trks or not trks[0].len:
+            return
+        trk = trks[0]
+        length = trk.len
+        if length != self._layout_len:
+            self._update_layout(length)
         # Perceived sync is better with a leading idx
-        trk_idx = (self._last_state.trks[0].idx) % len
+        trk_idx = trk.idx % length
         # Display track_idx in header
-        header_text = f"{trk_idx+1 if trk_idx < len else len}"
-        bbox: list[int] = self._font.getbbox(header_text)
-        text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
-        draw.text(
-            (5, 5),
-            header_text,
-            font=self._font,
-            fill=255
-        )
+        header_text = f"{trk_idx+1}"
+        bbox, _ = self._get_label(header_text)
+        text_height = bbox[3] - bbox[1]
+        self._draw_label(draw, (5, 5), header_text)
         
         # Draw a separator line
         if trk_idx > 0:
-            draw.line([(0, text_height + 10), (width * trk_idx // (len-1), text_height + 10)], fill=255)
+            draw.line([(0, text_height + 10), (self._line_xs[trk_idx], text_height + 10)], fill=255)
         
-        # Calculate area for progress bars
+        # Area for progress bars
         progress_start_y = text_height + 15
-        progress_height = 10
-        progress_spacing = 5
-        label_width = 10
-        progress_width = width - label_width - 5  # 5 pixels from right edge
         
-        # Draw progress bars for each track
-        for i, track in enumerate(self._last_state.trks):
-            y_pos = progress_start_y + i * (progress_height + progress_spacing)
-            
-            # Draw track label (first letter of track name)
-            track_label = track.name[0]  # First letter of track name
-            bbox = self._font.getbbox(track_label)
-            draw.text(
-                (5, y_pos + (progress_height - text_height) // 2),
-                track_label,
-                font=self._font,
-                fill=255
-            )
-            
-            # # Draw track progress bar outline
-            # self._draw.rectangle(
-            #     (label_width + 5, y_pos, label_width + 5 + progress_width, y_pos + progress_height),
-            #     outline=255,
-            #     fill=0
-            # )
-            
-            # Draw progress bar segments based on pattern
-            segment_width = progress_width / len
-            for j, val in enumerate(track.slots):
-                if val > 0:  # If this step is active
-                    segment_x = label_width + 5 + j * segment_width
-                    draw.rectangle(
-                        (segment_x, y_pos, segment_x + segment_width, y_pos + progress_height),
-                        outline=0,
-                        fill=255
-                    )
-            
+        # Draw track labels (first letter of track name) and progress bar segments based on pattern
+        tracks = tuple((track.name[0], track.steps) for track in trks)
+        top, mask = self._tracks_mask(length, tracks, progress_start_y, text_height)
+        draw.bitmap((0, top), mask, fill=255)
+
         # Highlight current position in pattern
-        cursor_x = label_width + 5 + trk_idx * segment_width
-        cursor_height = (progress_height + progress_spacing) * 3
+        cursor_x0, cursor_x1 = self._cursor_xs[trk_idx]
         draw.rectangle(
-            (cursor_x, progress_start_y - 1, cursor_x + segment_width, progress_start_y + cursor_height - 1),
+            (cursor_x0, progress_start_y - 1, cursor_x1, progress_start_y + self._cursor_height - 1),
             outline=255,
             fill=None
         )
@@ -198,12 +301,13 @@ class Playback(Module):
     def render_secondary(self, draw: ImageDraw):
         pass
 
-    def render_leds(self, pixels: Pi5Pixelbuf):
-        for i, slot in enumerate(self._last_state.trks[0].slots):
-            pixel_idx = i % 8
-            if slot > 0:
-                pixels[pixel_idx] = (12,0,0)
-            else:
-                pixels[pixel_idx] = (0,0,0)
-            if self._last_state.trks[0].idx == i:
-                pixels[pixel_idx] = (0,0,12)
\ No newline at end of file
+    def render_leds(self, leds: np.ndarray):
+        if not self._last_state.trks:
+            return
+        trk = self._last_state.trks[0]
+        n = trk.slots.size
+        # Steps wrap onto the 8 LEDs, the last step landing on each one decides its color
+        pixel_idx = np.arange(min(n, 8))
+        step = pixel_idx + 8 * ((n - 1 - pixel_idx) // 8)
+        leds[pixel_idx] = np.where((trk.slots[step] > 0)[:, None], LED_STEP, LED_OFF)
+        leds[pixel_idx[step == trk.idx]] = LED_CURSOR
\ No newline at end of file
@@ -14,17 +14,17 @@ _sym_db = _symbol_database.Default()
 from google.protobuf import duration_pb2 as google_dot_protobuf_dot_duration__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0bstate.proto\x12\nrdum.state\x1a\x1egoogle/protobuf/duration.proto\"C\n\tFileState\x12\'\n\tfile_type\x18\x01 \x01(\x0e\x32\x14.rdum.state.FileType\x12\r\n\x05\x66iles\x18\x02 \x03(\t\"\x89\x02\n\x05State\x12\r\n\x05tempo\x18\x01 \x01(\r\x12$\n\x04trks\x18\x03 \x03(\x0b\x32\x16.rdum.state.TrackState\x12\x10\n\x08\x64ivision\x18\x04 \x01(\r\x12\x13\n\x0b\x64\x65\x66\x61ult_len\x18\x05 \x01(\x04\x12*\n\x07latency\x18\x06 \x01(\x0b\x32\x19.google.protobuf.Duration\x12\x0f\n\x07playing\x18\x07 \x01(\x08\x12\x12\n\npattern_id\x18\x08 \x01(\x04\x12\x13\n\x0bpattern_len\x18\t \x01(\x04\x12\x14\n\x0cpattern_name\x18\n \x01(\t\x12\x19\n\x11queued_pattern_id\x18\x0b \x01(\x04\x12\r\n\x05swing\x18\x0c \x01(\r\"X\n\nTrackState\x12\r\n\x05slots\x18\x01 \x03(\r\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0b\n\x03idx\x18\x03 \x01(\x04\x12\x0b\n\x03len\x18\x04 \x01(\x04\x12\x13\n\x0bsample_path\x18\x05 \x01(\t\"\x9c\x02\n\x0e\x43ommandMessage\x12)\n\x0c\x63ommand_type\x18\x01 \x01(\x0e\x32\x13.rdum.state.Command\x12\x0f\n\x05tempo\x18\x02 \x01(\rH\x00\x12\x17\n\rpattern_index\x18\x03 \x01(\x04H\x00\x12\x12\n\x08\x64ivision\x18\x04 \x01(\rH\x00\x12\x34\n\x0fplay_sound_args\x18\x05 \x01(\x0b\x32\x19.rdum.state.PlaySoundArgsH\x00\x12)\n\tslot_args\x18\x06 \x01(\x0b\x32\x14.rdum.state.SlotArgsH\x00\x12\x38\n\x11track_length_args\x18\x07 \x01(\x0b\x32\x1b.rdum.state.TrackLengthArgsH\x00\x42\x06\n\x04\x61rgs\"E\n\x08SlotArgs\x12\x13\n\x0btrack_index\x18\x01 \x01(\x04\x12\x12\n\nslot_index\x18\x02 \x01(\x04\x12\x10\n\x08velocity\x18\x03 \x01(\r\"<\n\x0fTrackLengthArgs\x12\x13\n\x0btrack_index\x18\x01 \x01(\x04\x12\x14\n\x0ctrack_length\x18\x02 \x01(\x04\"6\n\rPlaySoundArgs\x12\x13\n\x0btrack_index\x18\x01 \x01(\x04\x12\x10\n\x08velocity\x18\x02 \x01(\r*#\n\x08\x46ileType\x12\x0b\n\x07PATTERN\x10\x00\x12\n\n\x06SAMPLE\x10\x01*\xca\x02\n\x07\x43ommand\x12\x17\n\x13\x43OMMAND_UNSPECIFIED\x10\x00\x12\x1a\n\x16\x43OMMAND_PLAY_SEQUENCER\x10\x01\x12\x1a\n\x16\x43OMMAND_STOP_SEQUENCER\x10\x02\x12\x15\n\x11\x43OMMAND_SET_TEMPO\x10\x03\x12\x17\n\x13\x43OMMAND_SET_PATTERN\x10\x04\x12\x18\n\x14\x43OMMAND_SET_DIVISION\x10\x05\x12\x16\n\x12\x43OMMAND_PLAY_SOUND\x10\x06\x12\x1d\n\x19\x43OMMAND_SET_SLOT_VELOCITY\x10\x07\x12\x1c\n\x18\x43OMMAND_SET_TRACK_LENGTH\x10\x08\x12\x17\n\x13\x43OMMAND_ADD_PATTERN\x10\t\x12\x1a\n\x16\x43OMMAND_REMOVE_PATTERN\x10\n\x12\x1a\n\x16\x43OMMAND_SELECT_PATTERN\x10\x0b\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0bstate.proto\x12\nrdum.state\x1a\x1egoogle/protobuf/duration.proto\"C\n\tFileState\x12\'\n\tfile_type\x18\x01 \x01(\x0e\x32\x14.rdum.state.FileType\x12\r\n\x05\x66iles\x18\x02 \x03(\t\"\x89\x02\n\x05State\x12\r\n\x05tempo\x18\x01 \x01(\r\x12$\n\x04trks\x18\x03 \x03(\x0b\x32\x16.rdum.state.TrackState\x12\x10\n\x08\x64ivision\x18\x04 \x01(\r\x12\x13\n\x0b\x64\x65\x66\x61ult_len\x18\x05 \x01(\x04\x12*\n\x07latency\x18\x06 \x01(\x0b\x32\x19.google.protobuf.Duration\x12\x0f\n\x07playing\x18\x07 \x01(\x08\x12\x12\n\npattern_id\x18\x08 \x01(\x04\x12\x13\n\x0bpattern_len\x18\t \x01(\x04\x12\x14\n\x0cpattern_name\x18\n \x01(\t\x12\x19\n\x11queued_pattern_id\x18\x0b \x01(\x04\x12\r\n\x05swing\x18\x0c \x01(\r\"X\n\nTrackState\x12\r\n\x05slots\x18\x01 \x03(\r\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0b\n\x03idx\x18\x03 \x01(\x04\x12\x0b\n\x03len\x18\x04 \x01(\x04\x12\x13\n\x0bsample_path\x18\x05 \x01(\t\"\x9a\x03\n\x0e\x43ommandMessage\x12)\n\x0c\x63ommand_type\x18\x01 \x01(\x0e\x32\x13.rdum.state.Command\x12\x0f\n\x05tempo\x18\x02 \x01(\rH\x00\x12\x17\n\rpattern_index\x18\x03 \x01(\x04H\x00\x12\x12\n\x08\x64ivision\x18\x04 \x01(\rH\x00\x12\x34\n\x0fplay_sound_args\x18\x05 \x01(\x0b\x32\x19.rdum.state.PlaySoundArgsH\x00\x12)\n\tslot_args\x18\x06 \x01(\x0b\x32\x14.rdum.state.SlotArgsH\x00\x12\x38\n\x11track_length_args\x18\x07 \x01(\x0b\x32\x1b.rdum.state.TrackLengthArgsH\x00\x12\x18\n\x0epattern_length\x18\x08 \x01(\x04H\x00\x12\x17\n\rpattern_fname\x18\t \x01(\tH\x00\x12\x0f\n\x05swing\x18\n \x01(\rH\x00\x12\x38\n\x11track_sample_args\x18\x0b \x01(\x0b\x32\x1b.rdum.state.TrackSampleArgsH\x00\x42\x06\n\x04\x61rgs\"E\n\x08SlotArgs\x12\x13\n\x0btrack_index\x18\x01 \x01(\x04\x12\x12\n\nslot_index\x18\x02 \x01(\x04\x12\x10\n\x08velocity\x18\x03 \x01(\r\"<\n\x0fTrackLengthArgs\x12\x13\n\x0btrack_index\x18\x01 \x01(\x04\x12\x14\n\x0ctrack_length\x18\x02 \x01(\x04\"6\n\rPlaySoundArgs\x12\x13\n\x0btrack_index\x18\x01 \x01(\x04\x12\x10\n\x08velocity\x18\x02 \x01(\r\";\n\x0fTrackSampleArgs\x12\x13\n\x0btrack_index\x18\x01 \x01(\x04\x12\x13\n\x0bsample_path\x18\x02 \x01(\t*#\n\x08\x46ileType\x12\x0b\n\x07PATTERN\x10\x00\x12\n\n\x06SAMPLE\x10\x01*\x9f\x04\n\x07\x43ommand\x12\x17\n\x13\x43OMMAND_UNSPECIFIED\x10\x00\x12\x1a\n\x16\x43OMMAND_PLAY_SEQUENCER\x10\x01\x12\x1a\n\x16\x43OMMAND_STOP_SEQUENCER\x10\x02\x12\x15\n\x11\x43OMMAND_SET_TEMPO\x10\x03\x12\x17\n\x13\x43OMMAND_SET_PATTERN\x10\x04\x12\x18\n\x14\x43OMMAND_SET_DIVISION\x10\x05\x12\x16\n\x12\x43OMMAND_PLAY_SOUND\x10\x06\x12\x1d\n\x19\x43OMMAND_SET_SLOT_VELOCITY\x10\x07\x12\x1c\n\x18\x43OMMAND_SET_TRACK_LENGTH\x10\x08\x12\x17\n\x13\x43OMMAND_ADD_PATTERN\x10\t\x12\x1a\n\x16\x43OMMAND_REMOVE_PATTERN\x10\n\x12\x1a\n\x16\x43OMMAND_SELECT_PATTERN\x10\x0b\x12\x1e\n\x1a\x43OMMAND_SET_PATTERN_LENGTH\x10\x0c\x12\x18\n\x14\x43OMMAND_SAVE_PATTERN\x10\r\x12\x18\n\x14\x43OMMAND_LOAD_PATTERN\x10\x0e\x12\x19\n\x15\x43OMMAND_LIST_PATTERNS\x10\x0f\x12\x18\n\x14\x43OMMAND_LIST_SAMPLES\x10\x10\x12\x15\n\x11\x43OMMAND_SET_SWING\x10\x11\x12\x15\n\x11\x43OMMAND_ADD_TRACK\x10\x12\x12\x1c\n\x18\x43OMMAND_SET_TRACK_SAMPLE\x10\x13\x62\x06proto3')
 
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'state_pb2', globals())
 if _descriptor._USE_C_DESCRIPTORS == False:
 
   DESCRIPTOR._options = None
-  _FILETYPE._serialized_start=962
-  _FILETYPE._serialized_end=997
-  _COMMAND._serialized_start=1000
-  _COMMAND._serialized_end=1330
+  _FILETYPE._serialized_start=1149
+  _FILETYPE._serialized_end=1184
+  _COMMAND._serialized_start=1187
+  _COMMAND._serialized_end=1730
   _FILESTATE._serialized_start=59
   _FILESTATE._serialized_end=126
   _STATE._serialized_start=129
@@ -32,11 +32,13 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _TRACKSTATE._serialized_start=396
   _TRACKSTATE._serialized_end=484
   _COMMANDMESSAGE._serialized_start=487
-  _COMMANDMESSAGE._serialized_end=771
-  _SLOTARGS._serialized_start=773
-  _SLOTARGS._serialized_end=842
-  _TRACKLENGTHARGS._serialized_start=844
-  _TRACKLENGTHARGS._serialized_end=904
-  _PLAYSOUNDARGS._serialized_start=906
-  _PLAYSOUNDARGS._serialized_end=960
+  _COMMANDMESSAGE._serialized_end=897
+  _SLOTARGS._serialized_start=899
+  _SLOTARGS._serialized_end=968
+  _TRACKLENGTHARGS._serialized_start=970
+  _TRACKLENGTHARGS._serialized_end=1030
+  _PLAYSOUNDARGS._serialized_start=1032
+  _PLAYSOUNDARGS._serialized_end=1086
+  _TRACKSAMPLEARGS._serialized_start=1088
+  _TRACKSAMPLEARGS._serialized_end=1147
 # @@protoc_insertion_point(module_scope)
@@ -1,6 +1,20 @@
 import socket
+import time
+import numpy as np
+from PIL import Image, ImageDraw
+
+# The address rarely changes, so the socket round trip only runs once per TTL
+IP_TTL: float = 30
+_IP_CACHE = {'ip': None, 'expiry': 0.0}
 
 def get_ip():
+    now = time.monotonic()
+    if _IP_CACHE['ip'] is None or now >= _IP_CACHE['expiry']:
+        _IP_CACHE['ip'] = _lookup_ip()
+        _IP_CACHE['expiry'] = now + IP_TTL
+    return _IP_CACHE['ip']
+
+def _lookup_ip():
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     s.settimeout(0)
     try:
@@ -12,3 +26,44 @@ def get_ip():
     finally:
         s.close()
     return IP
+
+class SnapshotRing:
+    """
+        Single-producer/single-consumer ring of fixed-width int32 snapshots
+        Only the producer advances head, so the consumer can read every row
+        committed since its last call without taking a lock
+    """
+    def __init__(self, size: int, width: int):
+        self._buf = np.zeros((size, width), np.int32)
+        self._size = size
+        self.head = 0
+
+    def reserve(self) -> np.ndarray:
+        """Writable view of the next slot, published by commit()"""
+        return self._buf[self.head % self._size]
+
+    def commit(self):
+        self.head += 1
+
+    def since(self, tail: int) -> tuple[np.ndarray, int]:
+        """
+            Copy of the rows committed after tail, oldest first, and the tail for the next call
+            At most size - 1 rows come back, the slot at head may be mid-write
+        """
+        head = self.head
+        start = max(tail, head - self._size + 1)
+        return self._buf.take(np.arange(start, head) % self._size, axis=0), head
+
+def new_frame(width: int, height: int) -> tuple[Image.Image, ImageDraw.ImageDraw, np.ndarray]:
+    """
+        Drawing surface whose pixels live in a NumPy array
+        The image is 8-bit so Pillow can map the array's memory instead of copying it,
+        and text is rasterized in 1-bit mode so every pixel stays 0 or 255
+    """
+    pixels = np.zeros((height, width), np.uint8)
+    image = Image.frombuffer("L", (width, height), pixels, "raw", "L", 0, 1)
+    # frombuffer marks mapped images read-only, which would make ImageDraw draw into a private copy
+    image.readonly = 0
+    draw = ImageDraw.Draw(image)
+    draw.fontmode = "1"
+    return image, draw, pixels
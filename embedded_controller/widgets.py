@@ -1,9 +1,24 @@
 from __future__ import annotations
 from PIL import ImageDraw, ImageFont
 from abc import ABC, abstractmethod
+import functools
+
+# Fixed pitch font, so a string's size is its length times the advance instead of a font lookup
+MONO_FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf"
+MONO_FONT_SIZE = 8
+
+def _load_font() -> tuple[ImageFont.ImageFont, tuple[int, int] | None]:
+    """Shared widget font and its character cell, or no cell when falling back to the proportional default"""
+    try:
+        font = ImageFont.truetype(MONO_FONT_PATH, MONO_FONT_SIZE)
+    except OSError:
+        return ImageFont.load_default(), None
+    # Ascender to descender, the same extent getbbox gives a proportional string
+    top, bottom = font.getbbox("Mg")[1::2]
+    return font, (round(font.getlength("M")), bottom - top)
 
 class Widget(ABC):
-    _font = ImageFont.load_default()
+    _font, _cell = _load_font()
 
     def __init__(self, children: list[Widget] = []):
         self.children = children
@@ -11,6 +26,10 @@ class Widget(ABC):
     def add_child(self, child: Widget):
         self.children.append(child)
 
+    def is_dirty(self) -> bool:
+        """Whether get_size may have changed since it was last asked"""
+        return True
+
     @abstractmethod
     def get_size(self) -> tuple[int, int]:
         pass
@@ -19,6 +38,14 @@ class Widget(ABC):
     def render(self, draw: ImageDraw, x: int, y: int):
         pass
 
+
+@functools.lru_cache(maxsize=512)
+def _measure(text: str) -> tuple[int, int]:
+    """Padded size of a string in the shared font, measured once per distinct string"""
+    if Widget._cell is not None:
+        return len(text) * Widget._cell[0] + 2, Widget._cell[1] + 4
+    bbox: list[int] = Widget._font.getbbox(text)
+    return bbox[2] - bbox[0] + 2, bbox[3] - bbox[1] + 4 # default 2 padding
     
 class HLayout(Widget):
     """
@@ -30,23 +57,42 @@ class HLayout(Widget):
         self._height: int = 0
         self._spacing = spacing
         self._border = border
+        # Child offsets, only laid out again when a child's size may have changed
+        self._offsets: list[tuple[int, int]] | None = None
         super().__init__(children)
-    
-    def render(self, draw: ImageDraw, x: int, y: int):
+
+    def add_child(self, child: Widget):
+        super().add_child(child)
+        self._offsets = None
+
+    def is_dirty(self) -> bool:
+        return self._offsets is None or any(child.is_dirty() for child in self.children)
+
+    def _update_layout(self):
         width: int = self._spacing
         height: int = 0
+        offsets = []
         for child in self.children:
-            child.render(draw, x + width, y + self._spacing)
+            offsets.append((width, self._spacing))
             w, h = child.get_size()
             width += w + self._spacing
             height = max(height, h + self._spacing)
+        self._offsets = offsets
         self._width = width
         self._height = height
+    
+    def render(self, draw: ImageDraw, x: int, y: int):
+        if self.is_dirty():
+            self._update_layout()
+        for child, (dx, dy) in zip(self.children, self._offsets):
+            child.render(draw, x + dx, y + dy)
 
         if self._border:
-            draw.rectangle((x, y, x + width, y + height), outline=255)
+            draw.rectangle((x, y, x + self._width, y + self._height), outline=255)
     
     def get_size(self) -> tuple[int, int]:
+        if self.is_dirty():
+            self._update_layout()
         return self._width, self._height
 
 class VLayout(Widget):
@@ -59,23 +105,42 @@ class VLayout(Widget):
         self._height: int = 0
         self._spacing = spacing
         self._border = border
+        # Child offsets, only laid out again when a child's size may have changed
+        self._offsets: list[tuple[int, int]] | None = None
         super().__init__(children)
-    
-    def render(self, draw: ImageDraw, x: int, y: int):
+
+    def add_child(self, child: Widget):
+        super().add_child(child)
+        self._offsets = None
+
+    def is_dirty(self) -> bool:
+        return self._offsets is None or any(child.is_dirty() for child in self.children)
+
+    def _update_layout(self):
         height: int = self._spacing
         width: int = 0
+        offsets = []
         for child in self.children:
-            child.render(draw, x + self._spacing, y + height)
+            offsets.append((self._spacing, height))
             w, h = child.get_size()
             height += h + self._spacing
             width = max(width, w + 2*self._spacing)
+        self._offsets = offsets
         self._width = width
         self._height = height
+    
+    def render(self, draw: ImageDraw, x: int, y: int):
+        if self.is_dirty():
+            self._update_layout()
+        for child, (dx, dy) in zip(self.children, self._offsets):
+            child.render(draw, x + dx, y + dy)
 
         if self._border:
-            draw.rectangle((x, y, x + width, y + height), outline=255)
+            draw.rectangle((x, y, x + self._width, y + self._height), outline=255)
     
     def get_size(self) -> tuple[int, int]:
+        if self.is_dirty():
+            self._update_layout()
         return self._width, self._height
 
 class Text(Widget):
@@ -84,17 +149,39 @@ class Text(Widget):
         Renders a string of text
     """
     def __init__(self, text: str = ""):
-        self.text = text
+        self._text = text
+        self._size_dirty = True
+        self._value = text
         super().__init__()
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    @text.setter
+    def text(self, text: str):
+        if text != self._text:
+            self._text = text
+            self._size_dirty = True
     
+    def set(self, value):
+        """Update from a raw value, only formatting it when it differs from the last one"""
+        if value != self._value:
+            self._value = value
+            self.text = str(value)
+
+    def is_dirty(self) -> bool:
+        return self._size_dirty
+
     def render(self, draw: ImageDraw, x: int, y: int):
         draw.text(
             (x, y),
-            f"{self.text}",
+            f"{self._text}",
             font=self._font,
             fill=255
         )
     
     def get_size(self) -> tuple[int, int]:
-        bbox: list[int] = self._font.getbbox(self.text)
-        return bbox[2] - bbox[0] + 2, bbox[3] - bbox[1] + 4 # default 2 padding
\ No newline at end of file
+        # Labels like "Enc1" repeat across widgets
+        self._size_dirty = False
+        return _measure(self._text)
\ No newline at end of file
@@ -1,25 +1,102 @@
 import zmq
+import os
 import sys
-from typing import Optional, Dict, Any
-from google.protobuf.json_format import MessageToDict
+import platform
+import numpy as np
+from typing import Callable, Optional
 import logging
 from dataclasses import dataclass, field
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# The upb and cpp protobuf backends are CPython extensions, PyPy's JIT runs the pure Python one best.
+# Set before anything imports protobuf, an explicit PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION still wins
+IS_PYPY = platform.python_implementation() == "PyPy"
+if IS_PYPY:
+    os.environ.setdefault("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION", "python")
+
+# Imported once for the whole process, channels and modules share this handle
+try:
+    from proto_gen import state_pb2
+except ImportError:
+    state_pb2 = None
+
+# The server binds both, IPC skips the loopback TCP stack when it runs on the same host
+SERVER_ADDRESS_IPC = "ipc:///tmp/rdum.sock"
+SERVER_ADDRESS_TCP = "tcp://localhost:5555"
+STATE_ADDRESS_IPC = "ipc:///tmp/rdum-state.sock"
+STATE_ADDRESS_TCP = "tcp://localhost:5556"
+
+# How long a command waits for room in the send pipe before it's reported as failed
+COMMAND_SEND_TIMEOUT_MS: int = 100
+
+# How long the IPC endpoint gets to accept a connection before falling back to TCP
+IPC_CONNECT_TIMEOUT: float = 0.2
+
+def local_address(ipc_address: str, tcp_address: str, timeout: float = IPC_CONNECT_TIMEOUT) -> str:
+    """
+        The IPC endpoint when a server on this host accepts a connection on it within timeout, TCP otherwise
+        The socket file alone isn't enough, a server that crashed or only bound TCP can leave a stale one
+    """
+    if not os.path.exists(ipc_address.removeprefix("ipc://")):
+        return tcp_address
+    probe = zmq.Context.instance().socket(zmq.DEALER)
+    monitor = probe.get_monitor_socket(zmq.EVENT_CONNECTED)
+    try:
+        probe.connect(ipc_address)
+        if monitor.poll(int(timeout * 1000)):
+            return ipc_address
+    finally:
+        probe.disable_monitor()
+        monitor.close(0)
+        probe.close(0)
+    logger.warning("Nothing accepted on %s, falling back to %s", ipc_address, tcp_address)
+    return tcp_address
+
+def _pack_steps(slots: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(slots > 0, bitorder="little").tobytes(), "little")
+
+def check_protobuf_backend():
+    """Warn when protobuf fell back to its pure Python runtime, which parses states many times slower"""
+    from google.protobuf.internal import api_implementation
+    backend = api_implementation.Type()
+    if backend == "python" and not IS_PYPY:
+        logger.warning("protobuf is using the pure Python backend, install a protobuf wheel with the upb or cpp backend")
+    else:
+        logger.info("protobuf backend: %s", backend)
+
+@dataclass(slots=True)
 class TrackState:
-    slots: list[int] = field(default_factory=list)
+    slots: np.ndarray = field(default_factory=lambda: np.zeros(0, np.uint8))
     name: str = ""
     idx: int = 0
     len: int = 0
     sample_path: str = ""
+    # Bit j set when step j is active
+    steps: int = 0
+    # Slots as last received, the pattern is only repacked when they differ
+    _slot_values: list[int] = field(init=False, repr=False, compare=False)
 
     def __post_init__(self):
-        self.idx = int(self.idx)
-        self.len = int(self.len)
+        self.slots = np.asarray(self.slots, dtype=np.uint8)
+        self.steps = _pack_steps(self.slots)
+        self._slot_values = self.slots.tolist()
+
+    def update(self, msg):
+        """Overwrite from a decoded TrackState message, only touching the slots when the pattern changed"""
+        if msg.slots != self._slot_values:
+            if self.slots.size == len(msg.slots):
+                self.slots[:] = msg.slots
+            else:
+                self.slots = np.array(msg.slots, dtype=np.uint8)
+            self.steps = _pack_steps(self.slots)
+            self._slot_values = list(msg.slots)
+        self.name = msg.name
+        self.idx = msg.idx
+        self.len = msg.len
+        self.sample_path = msg.sample_path
 
-@dataclass
+@dataclass(slots=True)
 class State:
     tempo: int = 120
     trks: list[TrackState] = field(default_factory=list)
@@ -33,66 +110,198 @@ class State:
     queued_pattern_id: int = 0
     swing: int = 0
 
-    def __post_init__(self):
-        self.trks = [TrackState(**trk) for trk in self.trks]
-        self.division = int(self.division)
-        self.default_len = int(self.default_len)
-        self.pattern_len = int(self.pattern_len)
-        self.queued_pattern_id = int(self.queued_pattern_id)
-        self.swing = int(self.swing)
+    def update(self, msg):
+        """Overwrite from a decoded State message in place, keeping the existing track objects"""
+        self.tempo = msg.tempo
+        del self.trks[len(msg.trks):]
+        for i, trk in enumerate(msg.trks):
+            if i == len(self.trks):
+                self.trks.append(TrackState())
+            self.trks[i].update(trk)
+        self.division = msg.division
+        self.default_len = msg.default_len
+        self.latency = msg.latency.seconds + msg.latency.nanos * 1e-9
+        self.playing = msg.playing
+        self.pattern_id = msg.pattern_id
+        self.pattern_len = msg.pattern_len
+        self.pattern_name = msg.pattern_name
+        self.queued_pattern_id = msg.queued_pattern_id
+        self.swing = msg.swing
+
+# Argument setters for the command senders, the server rejects these commands without their arguments
+def _set_tempo(cmd_msg, tempo):
+    cmd_msg.tempo = tempo
+
+def _set_pattern(cmd_msg, pattern_index):
+    cmd_msg.pattern_index = pattern_index
+
+def _set_division(cmd_msg, division):
+    cmd_msg.division = division
+
+def _set_play_sound(cmd_msg, track_index, velocity):
+    play_sound_args = cmd_msg.play_sound_args
+    play_sound_args.SetInParent()
+    play_sound_args.track_index = track_index
+    play_sound_args.velocity = velocity
+
+def _set_slot_velocity(cmd_msg, track_index, slot_index, velocity):
+    slot_args = cmd_msg.slot_args
+    slot_args.SetInParent()
+    slot_args.track_index = track_index
+    slot_args.slot_index = slot_index
+    slot_args.velocity = velocity
+
+def _set_track_length(cmd_msg, track_index, track_length):
+    track_length_args = cmd_msg.track_length_args
+    track_length_args.SetInParent()
+    track_length_args.track_index = track_index
+    track_length_args.track_length = track_length
 
 class ZMQChannel:
     """Receives and decodes ZMQ messages from RDUM"""
+    state_pb2 = state_pb2
     
-    def __init__(self, server_address: str = "tcp://localhost:5555"):
-        self.server_address = server_address
-        self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.REQ)  # REQ socket to pair with the REP socket in the server
+    def __init__(self, server_address: str | None = None, state_address: str | None = None):
+        self.server_address = server_address or local_address(SERVER_ADDRESS_IPC, SERVER_ADDRESS_TCP)
+        self.state_address = state_address or local_address(STATE_ADDRESS_IPC, STATE_ADDRESS_TCP)
+        # One context and IO thread per process, however many channels are opened
+        self.context = zmq.Context.instance(io_threads=1)
+        self.socket = self.context.socket(zmq.DEALER)  # DEALER so requests to the server's REP socket don't wait on replies
+        self.state_socket = self.context.socket(zmq.SUB)  # SUB socket for the server's state publisher
+        # Received without copying, protobuf parses straight out of the ZMQ frame's buffer
+        self._pending: memoryview | None = None
+        self._published = False
+        self._in_flight = 0
+        self._last_state: State | None = None
         
-        # Import the generated protobuf modules
-        try:
-            from proto_gen import state_pb2
-            self.state_pb2 = state_pb2
-        except ImportError:
+        if self.state_pb2 is None:
             logger.error("Could not import protobuf modules. Make sure they were generated correctly.")
             sys.exit(1)
+        check_protobuf_backend()
+        # Decoded into the same message and State every time instead of building new ones
+        self._state_msg = self.state_pb2.State()
+        # Enum names and argument setters looked up once instead of through the descriptors per command
+        self._cmd_names: dict[int, str] = {v: k for k, v in self.state_pb2.Command.items()}
+        pb = self.state_pb2
+        self._cmd_args = {
+            pb.COMMAND_SET_TEMPO: _set_tempo,
+            pb.COMMAND_SET_PATTERN: _set_pattern,
+            pb.COMMAND_SET_DIVISION: _set_division,
+            pb.COMMAND_PLAY_SOUND: _set_play_sound,
+            pb.COMMAND_SET_SLOT_VELOCITY: _set_slot_velocity,
+            pb.COMMAND_SET_TRACK_LENGTH: _set_track_length,
+        }
+        # One sender per command type, bound the first time the command is sent
+        self._senders: dict[int, Callable[..., None]] = {}
+    
+    def _bind_sender(self, command_type) -> Callable[..., None]:
+        """
+            Straight-line sender for one command type around its own message
+            Commands without arguments are serialized once, the rest only write their arguments per call
+        """
+        cmd_msg = self.state_pb2.CommandMessage(command_type=command_type)
+        set_args = self._cmd_args.get(command_type)
+        send = self._send
+        if set_args is None:
+            # proto3 has no required fields so skip the initialization check
+            payload = cmd_msg.SerializePartialToString()
+            def sender(**_):
+                send(payload)
+        else:
+            def sender(**kwargs):
+                set_args(cmd_msg, **kwargs)
+                send(cmd_msg.SerializePartialToString())
+        return sender
     
     def connect(self):
         """Connect to the ZMQ server"""
-        logger.info(f"Connecting to ZMQ server at {self.server_address}")
+        logger.info("Connecting to ZMQ server at %s", self.server_address)
         try:
+            # Only the newest state matters, so let ZMQ drop anything older. Must be set before connect
+            self.state_socket.setsockopt(zmq.CONFLATE, 1)
+            self.state_socket.setsockopt(zmq.RCVHWM, 1)
+            self.state_socket.setsockopt(zmq.SUBSCRIBE, b'')
+            self.state_socket.connect(self.state_address)
+            # Don't queue commands up for a server that isn't there and keep the connection alive
+            # through idle stretches. A burst of pad hits can outrun the server, so commands wait
+            # briefly for room in the pipe instead of being dropped
+            self.socket.setsockopt(zmq.LINGER, 0)
+            self.socket.setsockopt(zmq.IMMEDIATE, 1)
+            self.socket.setsockopt(zmq.SNDHWM, 64)
+            self.socket.setsockopt(zmq.SNDTIMEO, COMMAND_SEND_TIMEOUT_MS)
+            self.socket.setsockopt(zmq.TCP_KEEPALIVE, 1)
             self.socket.connect(self.server_address)
             logger.info("Connected successfully")
             return True
         except zmq.ZMQError as e:
-            logger.error(f"Failed to connect: {e}")
+            logger.error("Failed to connect: %s", e)
             return False
     
-    def receive_state(self) -> Optional[Dict[str, Any]]:
-        """Send an empty message to trigger a response, then receive and decode the state"""
+    def drain_state(self):
+        """Take the newest published state off the socket without decoding it"""
         try:
-            # Send an empty message to trigger a response
-            self.socket.send(b'')
-            
-            # Receive the response
-            message = self.socket.recv()
+            self._pending = self.state_socket.recv(zmq.NOBLOCK, copy=False).buffer
+            self._published = True
+        except zmq.Again:
+            pass
+
+    def _send(self, payload: bytes, flags: int = 0):
+        # The empty frame stands in for the envelope REQ would add
+        self.socket.send_multipart([b'', payload], flags)
+        self._in_flight += 1
+
+    def _drain_replies(self) -> memoryview | None:
+        """Take every reply that came back off the socket, the server answers each request with its state"""
+        reply = None
+        while self._in_flight:
+            try:
+                reply = self.socket.recv_multipart(zmq.NOBLOCK, copy=False)[-1].buffer
+            except zmq.Again:
+                break
+            self._in_flight -= 1
+        return reply
+
+    def _poll_state(self, reply: memoryview | None) -> memoryview | None:
+        """
+            Fallback for a server that doesn't publish. One poll is kept in flight and its reply
+            is picked up on the next call, so only the very first state waits on a round trip
+        """
+        if reply is None and self._last_state is None:
+            # Nothing to show yet, so wait for the first state
+            if not self._in_flight:
+                self._send(b'')
+            reply = self.socket.recv_multipart(copy=False)[-1].buffer
+            self._in_flight -= 1
+        if not self._in_flight:
+            try:
+                self._send(b'', zmq.DONTWAIT)
+            except zmq.Again:
+                pass
+        return reply
+
+    def receive_state(self) -> Optional[State]:
+        """Decode the newest published state, or return the last one if nothing new arrived"""
+        try:
+            self.drain_state()
+            reply = self._drain_replies()
+            message, self._pending = self._pending, None
+            if message is None:
+                if not self._published:
+                    message = self._poll_state(reply)
+                if message is None:
+                    return self._last_state
             
             # Decode the protobuf message
-            state = self.state_pb2.State()
-            state.ParseFromString(message)
-            
-            # Convert to dictionary for easier logging
-            state_dict = MessageToDict(
-                state,
-                preserving_proto_field_name=True
-            )
-
-            return State(**state_dict)
+            self._state_msg.ParseFromString(message)
+            if self._last_state is None:
+                self._last_state = State()
+            self._last_state.update(self._state_msg)
+            return self._last_state
         except zmq.ZMQError as e:
-            logger.error(f"ZMQ error: {e}")
+            logger.error("ZMQ error: %s", e)
             return None
         except Exception as e:
-            logger.error(f"Error receiving state: {e}")
+            logger.error("Error receiving state: %s", e)
             return None
     
     def send_command(self, command_type, **kwargs):
@@ -106,56 +315,22 @@ class ZMQChannel:
             bool: True if the command was sent successfully, False otherwise
         """
         try:
-            # Create the command message
-            cmd_msg = self.state_pb2.CommandMessage()
-            cmd_msg.command_type = command_type
-            
-            # Set command-specific arguments
-            if command_type == self.state_pb2.COMMAND_SET_TEMPO and 'tempo' in kwargs:
-                cmd_msg.tempo = kwargs['tempo']
-            elif command_type == self.state_pb2.COMMAND_SET_PATTERN and 'pattern_index' in kwargs:
-                cmd_msg.pattern_index = kwargs['pattern_index']
-            elif command_type == self.state_pb2.COMMAND_SET_DIVISION and 'division' in kwargs:
-                cmd_msg.division = kwargs['division']
-            elif command_type == self.state_pb2.COMMAND_PLAY_SOUND and 'track_index' in kwargs and 'velocity' in kwargs:
-                play_sound_args = self.state_pb2.PlaySoundArgs(
-                    track_index=kwargs['track_index'],
-                    velocity=kwargs['velocity']
-                )
-                cmd_msg.play_sound_args.CopyFrom(play_sound_args)
-            elif command_type == self.state_pb2.COMMAND_SET_SLOT_VELOCITY and 'track_index' in kwargs and 'slot_index' in kwargs:
-                slot_args = self.state_pb2.SlotArgs(
-                    track_index=kwargs['track_index'],
-                    slot_index=kwargs['slot_index'],
-                    velocity=kwargs['velocity']
-                )
-                cmd_msg.slot_args.CopyFrom(slot_args)
-            elif command_type == self.state_pb2.COMMAND_SET_TRACK_LENGTH and 'track_index' in kwargs and 'track_length' in kwargs:
-                track_length_args = self.state_pb2.TrackLengthArgs(
-                    track_index=kwargs['track_index'],
-                    track_length=kwargs['track_length']
-                )
-                cmd_msg.track_length_args.CopyFrom(track_length_args)
-            
-            # Serialize the command message
-            cmd_bytes = cmd_msg.SerializeToString()
-            
-            # Send the command
-            self.socket.send(cmd_bytes)
+            sender = self._senders.get(command_type)
+            if sender is None:
+                sender = self._senders[command_type] = self._bind_sender(command_type)
             
-            # Wait for response (needed for REQ/REP pattern)
-            response = self.socket.recv()
+            # Send the command, the state the server replies with is picked up by receive_state
+            sender(**kwargs)
             
-            # Process response if needed (in this case, just log success)
-            logger.info(f"Command sent successfully: {self.state_pb2.Command.Name(command_type)}")
+            logger.info("Command sent successfully: %s", self._cmd_names.get(command_type, command_type))
             return True
         
         except Exception as e:
-            logger.error(f"Error sending command: {e}")
+            logger.error("Error sending command: %s", e)
             return False
     
     def close(self):
-        """Close the ZMQ socket and context"""
+        """Close the ZMQ sockets, the shared context stays up for other channels"""
         logger.info("Closing ZMQ connection")
-        self.socket.close()
-        self.context.term()
\ No newline at end of file
+        self.state_socket.close()
+        self.socket.close()
\ No newline at end of file
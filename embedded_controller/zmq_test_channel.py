@@ -13,9 +13,9 @@ import time
 import os
 import sys
 import subprocess
-from typing import Optional, Dict, Any
+import hashlib
+from typing import Optional, Any
 import argparse
-from google.protobuf.json_format import MessageToDict
 
 # Set up logging
 logging.basicConfig(
@@ -25,9 +25,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# How long monitor waits for a published state before polling the command socket instead
+PUBLISH_WAIT_MS = 1000
+
+def _run_protoc(cmd: list[str]):
+    """Run protoc in process through grpc_tools when it's installed, otherwise as a subprocess"""
+    try:
+        from grpc_tools import protoc
+    except ImportError:
+        subprocess.run(cmd, check=True)
+        return
+    # grpc_tools bundles the well known types state.proto imports, but doesn't add them to the path itself
+    well_known = os.path.join(os.path.dirname(protoc.__file__), "_proto")
+    returncode = protoc.main([*cmd[:-1], f"--proto_path={well_known}", cmd[-1]])
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
 # Ensure the protobuf module is generated
 def ensure_protobuf_module():
-    """Generate Python protobuf modules if they don't exist"""
+    """Generate Python protobuf modules if they don't exist or state.proto changed since they were generated"""
     # Path to the proto directory
     proto_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "proto")
     state_proto = os.path.join(proto_dir, "state.proto")
@@ -35,9 +51,19 @@ def ensure_protobuf_module():
     # Output directory for generated Python modules
     output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "proto_gen")
     os.makedirs(output_dir, exist_ok=True)
+    module_path = os.path.join(output_dir, "state_pb2.py")
+    # Hash of the state.proto the module was generated from, so protoc only runs when it changed.
+    # Committed with the module, so a fresh checkout doesn't regenerate
+    hash_path = os.path.join(output_dir, "state_pb2.sha")
     
-    # Check if the module already exists
-    if not os.path.exists(os.path.join(output_dir, "state_pb2.py")):
+    with open(state_proto, "rb") as f:
+        proto_hash = hashlib.blake2b(f.read()).hexdigest()
+    generated_hash = None
+    if os.path.exists(hash_path):
+        with open(hash_path) as f:
+            generated_hash = f.read().strip()
+    
+    if not os.path.exists(module_path) or generated_hash != proto_hash:
         logger.info("Generating protobuf Python modules...")
         cmd = [
             "protoc",
@@ -46,161 +72,146 @@ def ensure_protobuf_module():
             state_proto
         ]
         try:
-            subprocess.run(cmd, check=True)
+            _run_protoc(cmd)
             logger.info("Successfully generated protobuf modules")
             
             # Create __init__.py file to make it a proper Python package
             with open(os.path.join(output_dir, "__init__.py"), "w") as f:
                 pass
+            with open(hash_path, "w") as f:
+                f.write(proto_hash)
                 
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Failed to generate protobuf modules: {e}")
-            logger.error("Make sure 'protoc' is installed. Install with: brew install protobuf")
-            sys.exit(1)
+        except (subprocess.CalledProcessError, OSError) as e:
+            if not os.path.exists(module_path):
+                logger.error("Failed to generate protobuf modules: %s", e)
+                logger.error("Make sure grpcio-tools or 'protoc' is installed. Install with: pip install grpcio-tools")
+                sys.exit(1)
+            logger.warning("Could not regenerate protobuf modules, using the existing ones: %s", e)
     
     # Add the directory to Python path so we can import the generated modules
-    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    if module_dir not in sys.path:
+        sys.path.append(module_dir)
 
 
-class ZMQChannel:
-    """Receives and decodes ZMQ messages from RDUM"""
-    
-    def __init__(self, server_address: str = "tcp://localhost:5555"):
-        self.server_address = server_address
-        self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.REQ)  # REQ socket to pair with the REP socket in the server
-        
-        # Import the generated protobuf modules
-        try:
-            from proto_gen import state_pb2
-            self.state_pb2 = state_pb2
-        except ImportError:
-            logger.error("Could not import protobuf modules. Make sure they were generated correctly.")
-            sys.exit(1)
-    
-    def connect(self):
-        """Connect to the ZMQ server"""
-        logger.info(f"Connecting to ZMQ server at {self.server_address}")
-        try:
-            self.socket.connect(self.server_address)
-            logger.info("Connected successfully")
-            return True
-        except zmq.ZMQError as e:
-            logger.error(f"Failed to connect: {e}")
-            return False
+# Generated before zmq_channel imports it once for the whole process
+ensure_protobuf_module()
+import zmq_channel
+
+
+class ZMQChannel(zmq_channel.ZMQChannel):
+    """The controller's channel, with a blocking state feed for monitoring and commands that wait for delivery"""
     
-    def receive_state(self) -> Optional[Dict[str, Any]]:
-        """Send an empty message to trigger a response, then receive and decode the state"""
+    def receive_published_state(self) -> Optional[Any]:
+        """Block until the server publishes a state, then decode the newest one"""
         try:
-            # Send an empty message to trigger a response
-            self.socket.send(b'')
-            
-            # Receive the response
-            message = self.socket.recv()
-            
-            # Decode the protobuf message
-            state = self.state_pb2.State()
+            # Received without copying, protobuf parses straight out of the ZMQ frame's buffer
+            message = self.state_socket.recv(copy=False).buffer
+            state = self._state_msg
             state.ParseFromString(message)
-            
-            # Convert to dictionary for easier logging
-            state_dict = MessageToDict(
-                state,
-                preserving_proto_field_name=True
-            )
-            
-            return state_dict
+            return state
         except zmq.ZMQError as e:
-            logger.error(f"ZMQ error: {e}")
+            logger.error("ZMQ error: %s", e)
             return None
         except Exception as e:
-            logger.error(f"Error receiving state: {e}")
+            logger.error("Error receiving state: %s", e)
             return None
+
+    def _send(self, payload: bytes, flags: int = 0):
+        # A one shot command is sent right after connecting, so wait for the connection instead of failing
+        super()._send(payload, 0)
     
     def send_command(self, command_type, **kwargs):
-        """Send a command to the ZMQ server
-        
-        Args:
-            command_type: The Command enum value to send
-            **kwargs: Command-specific arguments
-        
-        Returns:
-            bool: True if the command was sent successfully, False otherwise
-        """
-        try:
-            # Create the command message
-            cmd_msg = self.state_pb2.CommandMessage()
-            cmd_msg.command_type = command_type
-            
-            # Set command-specific arguments
-            if command_type == self.state_pb2.COMMAND_SET_TEMPO and 'tempo' in kwargs:
-                cmd_msg.tempo = kwargs['tempo']
-            elif command_type == self.state_pb2.COMMAND_SET_PATTERN and 'pattern_index' in kwargs:
-                cmd_msg.pattern_index = kwargs['pattern_index']
-            elif command_type == self.state_pb2.COMMAND_SET_DIVISION and 'division' in kwargs:
-                cmd_msg.division = kwargs['division']
-            elif command_type == self.state_pb2.COMMAND_PLAY_SOUND and 'track_index' in kwargs and 'velocity' in kwargs:
-                play_sound_args = self.state_pb2.PlaySoundArgs(
-                    track_index=kwargs['track_index'],
-                    velocity=kwargs['velocity']
-                )
-                cmd_msg.play_sound_args.CopyFrom(play_sound_args)
-            elif command_type == self.state_pb2.COMMAND_SET_SLOT_VELOCITY and 'track_index' in kwargs and 'slot_index' in kwargs:
-                slot_args = self.state_pb2.SlotArgs(
-                    track_index=kwargs['track_index'],
-                    slot_index=kwargs['slot_index'],
-                    velocity=kwargs['velocity']
-                )
-                cmd_msg.slot_args.CopyFrom(slot_args)
-            elif command_type == self.state_pb2.COMMAND_SET_TRACK_LENGTH and 'track_index' in kwargs and 'track_length' in kwargs:
-                track_length_args = self.state_pb2.TrackLengthArgs(
-                    track_index=kwargs['track_index'],
-                    track_length=kwargs['track_length']
-                )
-                cmd_msg.track_length_args.CopyFrom(track_length_args)
-            
-            # Serialize the command message
-            cmd_bytes = cmd_msg.SerializeToString()
-            
-            # Send the command
-            self.socket.send(cmd_bytes)
-            
-            # Wait for response (needed for REQ/REP pattern)
-            response = self.socket.recv()
-            print(response)
-            
-            # Process response if needed (in this case, just log success)
-            logger.info(f"Command sent successfully: {self.state_pb2.Command.Name(command_type)}")
-            return True
-        
-        except Exception as e:
-            logger.error(f"Error sending command: {e}")
+        """Send a command and print the server's reply, play and stop don't wait for one"""
+        if not super().send_command(command_type, **kwargs):
             return False
-    
+        if command_type in (self.state_pb2.COMMAND_PLAY_SEQUENCER, self.state_pb2.COMMAND_STOP_SEQUENCER):
+            return True
+        # The server answers every request, the last reply is the one for this command
+        while self._in_flight:
+            response = self.socket.recv_multipart(copy=False)[-1]
+            self._in_flight -= 1
+        print(response.bytes)
+        return True
+
     def close(self):
-        """Close the ZMQ socket and context"""
-        logger.info("Closing ZMQ connection")
-        self.socket.close()
-        self.context.term()
+        # Commands nobody waited on may still be queued, give them a moment to go out
+        self.socket.setsockopt(zmq.LINGER, 1000)
+        super().close()
+
+
+def _clamp(value: int, lo: int, hi: int) -> int:
+    return lo if value < lo else hi if value > hi else value
+
+
+# Subcommand actions, picked by argparse through set_defaults(func=...)
+def _action_monitor(channel, args, state_pb2):
+    logger.info("Monitoring state updates, at most one every %s seconds. Press Ctrl+C to stop.", args.interval)
+    while True:
+        # Nothing is sent while the server publishes. One that doesn't, or whose publisher failed to bind,
+        # still answers state polls on the command socket
+        if channel.state_socket.poll(PUBLISH_WAIT_MS):
+            state = channel.receive_published_state()
+        else:
+            state = channel.receive_state()
+        if state is None:
+            pass
+        elif args.full:
+            logger.info("Received state: %s", state)
+        else:
+            # Formatting every track's slots dominates the cost of a full log line
+            logger.info("Received state: tempo=%d playing=%s pattern=%d division=%d tracks=%d",
+                        state.tempo, state.playing, state.pattern_id, state.division, len(state.trks))
+        if args.interval > 0:
+            time.sleep(args.interval)
+
+def _action_play(channel, args, state_pb2):
+    channel.send_command(state_pb2.COMMAND_PLAY_SEQUENCER)
+
+def _action_stop(channel, args, state_pb2):
+    channel.send_command(state_pb2.COMMAND_STOP_SEQUENCER)
+
+def _action_tempo(channel, args, state_pb2):
+    tempo = _clamp(args.value, 30, 300)  # Clamp tempo between 30-300 BPM
+    channel.send_command(state_pb2.COMMAND_SET_TEMPO, tempo=tempo)
+
+def _action_division(channel, args, state_pb2):
+    channel.send_command(state_pb2.COMMAND_SET_DIVISION, division=args.value)
+
+def _action_pattern(channel, args, state_pb2):
+    channel.send_command(state_pb2.COMMAND_SET_PATTERN, pattern_index=args.index)
+
+def _action_sound(channel, args, state_pb2):
+    channel.send_command(state_pb2.COMMAND_PLAY_SOUND, 
+                       track_index=args.track,
+                       velocity=_clamp(args.velocity, 0, 127))
+
+def _action_slot(channel, args, state_pb2):
+    channel.send_command(state_pb2.COMMAND_SET_SLOT_VELOCITY, 
+                       track_index=args.track,
+                       slot_index=args.slot,
+                       velocity=_clamp(args.velocity, 0, 127))
+
+def _action_length(channel, args, state_pb2):
+    length = _clamp(args.length, 1, 64)  # Clamp length between 1-64
+    channel.send_command(state_pb2.COMMAND_SET_TRACK_LENGTH, 
+                       track_index=args.track,
+                       track_length=length)
 
 
 def main():
     """Main function to run the ZMQ channel"""
-    # Ensure protobuf modules are generated
-    ensure_protobuf_module()
-    
-    # Import protobuf modules for command names
-    try:
-        from proto_gen import state_pb2
-    except ImportError:
-        logger.error("Could not import protobuf modules. Make sure they were generated correctly.")
-        sys.exit(1)
-    
     # Create parser
     parser = argparse.ArgumentParser(description="ZMQ Test Channel for RDUM")
     parser.add_argument(
         "--server", 
-        default="tcp://localhost:5555",
-        help="ZMQ server address (default: tcp://localhost:5555)"
+        default=None,
+        help="ZMQ server address (default: ipc:///tmp/rdum.sock if the server created it, else tcp://localhost:5555)"
+    )
+    parser.add_argument(
+        "--state-server",
+        default=None,
+        help="ZMQ state publisher address (default: ipc:///tmp/rdum-state.sock if the server created it, else tcp://localhost:5556)"
     )
     
     # Create subparsers for different actions
@@ -208,25 +219,33 @@ def main():
     
     # Monitor subcommand
     monitor_parser = subparsers.add_parser("monitor", help="Monitor state updates")
+    monitor_parser.set_defaults(func=_action_monitor)
     monitor_parser.add_argument(
         "--interval", 
         type=float, 
         default=0.5,
-        help="Polling interval in seconds (default: 0.5)"
+        help="Minimum seconds between logged states, 0 logs every published state (default: 0.5)"
+    )
+    monitor_parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Log the whole state including every track instead of a summary"
     )
     
     # Play sequencer command
-    subparsers.add_parser("play", help="Start the sequencer")
+    subparsers.add_parser("play", help="Start the sequencer").set_defaults(func=_action_play)
     
     # Stop sequencer command
-    subparsers.add_parser("stop", help="Stop the sequencer")
+    subparsers.add_parser("stop", help="Stop the sequencer").set_defaults(func=_action_stop)
     
     # Set tempo command
     tempo_parser = subparsers.add_parser("tempo", help="Set the tempo (BPM)")
+    tempo_parser.set_defaults(func=_action_tempo)
     tempo_parser.add_argument("value", type=int, help="Tempo value in BPM (30-300)")
     
     # Set division command
     division_parser = subparsers.add_parser("division", help="Set the note division")
+    division_parser.set_defaults(func=_action_division)
     division_parser.add_argument(
         "value", 
         type=int, 
@@ -236,21 +255,25 @@ def main():
     
     # Set pattern command
     pattern_parser = subparsers.add_parser("pattern", help="Set the current pattern")
+    pattern_parser.set_defaults(func=_action_pattern)
     pattern_parser.add_argument("index", type=int, help="Pattern index")
     
     # Play sound command
     sound_parser = subparsers.add_parser("sound", help="Play a sound from a track")
+    sound_parser.set_defaults(func=_action_sound)
     sound_parser.add_argument("track", type=int, help="Track index")
     sound_parser.add_argument("velocity", type=int, help="Velocity (0-127)")
     
     # Set slot velocity command
     slot_parser = subparsers.add_parser("slot", help="Set velocity for a slot")
+    slot_parser.set_defaults(func=_action_slot)
     slot_parser.add_argument("track", type=int, help="Track index")
     slot_parser.add_argument("slot", type=int, help="Slot index")
     slot_parser.add_argument("velocity", type=int, help="Velocity (0-127)")
     
     # Set track length command
     length_parser = subparsers.add_parser("length", help="Set track length")
+    length_parser.set_defaults(func=_action_length)
     length_parser.add_argument("track", type=int, help="Track index")
     length_parser.add_argument("length", type=int, help="Track length (1-64)")
     
@@ -262,56 +285,16 @@ def main():
         sys.exit(1)
     
     # Create and connect the channel
-    channel = ZMQChannel(args.server)
+    channel = ZMQChannel(args.server, args.state_server)
     if not channel.connect():
         sys.exit(1)
     
     try:
-        if args.action == "monitor":
-            logger.info(f"Starting to monitor state updates every {args.interval} seconds. Press Ctrl+C to stop.")
-            while True:
-                state = channel.receive_state()
-                if state:
-                    logger.info(f"Received state: {state}")
-                time.sleep(args.interval)
-                
-        elif args.action == "play":
-            channel.send_command(state_pb2.COMMAND_PLAY_SEQUENCER)
-            
-        elif args.action == "stop":
-            channel.send_command(state_pb2.COMMAND_STOP_SEQUENCER)
-            
-        elif args.action == "tempo" and hasattr(args, "value"):
-            tempo = max(30, min(300, args.value))  # Clamp tempo between 30-300 BPM
-            channel.send_command(state_pb2.COMMAND_SET_TEMPO, tempo=tempo)
-            
-        elif args.action == "division" and hasattr(args, "value"):
-            channel.send_command(state_pb2.COMMAND_SET_DIVISION, division=args.value)
-            
-        elif args.action == "pattern" and hasattr(args, "index"):
-            channel.send_command(state_pb2.COMMAND_SET_PATTERN, pattern_index=args.index)
-            
-        elif args.action == "sound" and hasattr(args, "track") and hasattr(args, "velocity"):
-            channel.send_command(state_pb2.COMMAND_PLAY_SOUND, 
-                               track_index=args.track,
-                               velocity=min(127, max(0, args.velocity)))
-            
-        elif args.action == "slot" and hasattr(args, "track") and hasattr(args, "slot"):
-            channel.send_command(state_pb2.COMMAND_SET_SLOT_VELOCITY, 
-                               track_index=args.track,
-                               slot_index=args.slot,
-                               velocity=min(127, max(0, args.velocity)))
-            
-        elif args.action == "length" and hasattr(args, "track") and hasattr(args, "length"):
-            length = max(1, min(64, args.length))  # Clamp length between 1-64
-            channel.send_command(state_pb2.COMMAND_SET_TRACK_LENGTH, 
-                               track_index=args.track,
-                               track_length=length)
-                                
+        args.func(channel, args, channel.state_pb2)
     except KeyboardInterrupt:
         logger.info("Channel stopped by user")
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
     finally:
         channel.close()
 
@@ -166,6 +166,10 @@ fn proto_message_to_command(proto_cmd: &state::CommandMessage) -> Result<Command
 
 pub struct ZeroMQController {
     addr: String,
+    pub_addr: String,
+    // Same-host clients skip the loopback TCP stack through these
+    ipc_addr: String,
+    ipc_pub_addr: String,
     cmd_tx_ch: mpsc::Sender<Command>,
     state_rx_ch: mpsc::Receiver<StateUpdate>,
     last_state: SeqState,
@@ -175,6 +179,9 @@ impl ZeroMQController {
     pub fn new(cmd_tx_ch: mpsc::Sender<Command>, state_rx_ch: mpsc::Receiver<StateUpdate>) -> Self {
         Self {
             addr: "tcp://*:5555".to_string(),
+            pub_addr: "tcp://*:5556".to_string(),
+            ipc_addr: "ipc:///tmp/rdum.sock".to_string(),
+            ipc_pub_addr: "ipc:///tmp/rdum-state.sock".to_string(),
             cmd_tx_ch,
             state_rx_ch,
             last_state: SeqState::default(),
@@ -188,16 +195,36 @@ impl ZeroMQController {
             eprintln!("Failed to bind socket: {}", e);
             return;
         }
+        if let Err(e) = socket.bind(&self.ipc_addr) {
+            eprintln!("Failed to bind IPC socket, clients will use TCP: {}", e);
+        }
+
+        // Every new state is also published so clients can read the latest without a round trip
+        let publisher = ctx.socket(zmq::PUB).unwrap();
+        // Without it clients fall back to polling the command socket, so keep serving that
+        if let Err(e) = publisher.bind(&self.pub_addr) {
+            eprintln!("Failed to bind publisher socket, clients will poll for state: {}", e);
+        }
+        if let Err(e) = publisher.bind(&self.ipc_pub_addr) {
+            eprintln!("Failed to bind IPC publisher socket, clients will use TCP: {}", e);
+        }
 
         let mut polled_items = [socket.as_poll_item(zmq::POLLIN)];
         
         loop {
-            if let Ok(state) = self.state_rx_ch.try_recv() {
+            let mut updated = false;
+            while let Ok(state) = self.state_rx_ch.try_recv() {
                 match state {
-                    StateUpdate::SeqState(state) => self.last_state = state,
+                    StateUpdate::SeqState(state) => {
+                        self.last_state = state;
+                        updated = true;
+                    },
                     _ => {}
                 }
             }
+            if updated {
+                let _ = send_state(&publisher, &self.last_state);
+            }
             
             // Poll with zero timeout for non-blocking behavior
             if zmq::poll(&mut polled_items, 0).is_ok() {